@@ -1,7 +1,10 @@
 import logging
+import os
 import random
+from array import array
+from dataclasses import dataclass, field
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update, ForceReply, Message
-from telegram.ext import Updater, CommandHandler, CallbackContext, CallbackQueryHandler, ConversationHandler, MessageHandler
+from telegram.ext import Updater, CommandHandler, CallbackContext, CallbackQueryHandler, ConversationHandler, MessageHandler, Filters, Defaults
 
 from config import bot_token
 
@@ -9,483 +12,422 @@ from config import bot_token
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Dispatcher worker threads; PTB wants the connection pool to be at least workers + 4
+WORKERS = 16
+# Long-poll for up to this many seconds so idle periods cost one getUpdates call, not many
+POLL_TIMEOUT = 30
+
+# Set SUSKIA_WEBHOOK_URL (the public base URL) to have Telegram push updates instead of polling
+WEBHOOK_URL = os.environ.get('SUSKIA_WEBHOOK_URL')
+WEBHOOK_PORT = int(os.environ.get('SUSKIA_WEBHOOK_PORT', '8443'))
+
 # States for the conversation
-SELECT_PLAYERS, SELECT_ROLES, SELECTING_CARDS, P_HAS_CARD, HANDLE_ELIMINATION, GAME_OVER, ASK_NAME, ADD_NAME, NAME_DEFAULT, SELECT_CARD, END_ROUND, END_GAME = range(12)
-
-# Global variables to store game data
-global first_pass
-first_pass = True
-global available_cards
-global standings
-standings = []
-global num_civilians
-global num_undercovers
-global num_mr_white
-global sequence
-global num_players
-global chosen_word_pair
-chosen_word_pair = {'C': None, 'U': None}
-num_players = 0
-player_dict = {}
-player_order = []
-selected_cards = []
-words_library = {
-    'C': [
-        'DOG', 'ICE CREAM', 'MEATBALLS', 'KUNG FU', 'CAMPING', 'COCA COLA',
-        'CAR', 'GUITAR', 'SUNRISE', 'RIVER', 'APPLE', 'TEA', 'FORK', 'CHAIR',
-        'PIZZA', 'LAPTOP', 'HAT', 'OWL', 'SNOW', 'LAKE', 'OCEAN', 'ROSE',
-        'SKATEBOARD', 'SOFA', 'TENNIS', 'COW', 'BOOK', 'BICYCLE', 'PEN',
-        'GLASSES', 'BANANA', 'BEACH', 'WINE', 'TRAIN', 'CINEMA', 'SANDALS',
-        'FISH', 'WINTER', 'GOLF', 'PARROT', 'VOLLEYBALL', 'TIGER', 'PAINTING',
-        'MOUNTAIN', 'JAZZ', 'FOREST', 'ROCK', 'CANDLE', 'KITE', 'CLOCK',
-        'CHOCOLATE', 'WHISKEY', 'ELEPHANT', 'NEWSPAPER', 'SPOON', 'RAINBOW',
-        'CAMERA', 'SAILBOAT', 'GARDEN', 'CAKE', 'MONKEY', 'SCISSORS', 'POOL',
-        'CELLPHONE', 'ZEBRA', 'RUGBY', 'PUMPKIN', 'COMPUTER', 'STOVE'
-    ],
-    'U': [
-        'WOLF', 'YOGHURT', 'CHICKEN NUGGETS', 'KARATE', 'PICNIC', 'FANTA',
-        'TRUCK', 'VIOLIN', 'SUNSET', 'STREAM', 'PEAR', 'COFFEE', 'SPOON', 'STOOL',
-        'BURGER', 'TABLET', 'CAP', 'EAGLE', 'RAIN', 'POND', 'SEA', 'TULIP',
-        'ROLLERBLADES', 'ARMCHAIR', 'BADMINTON', 'BULL', 'MAGAZINE', 'MOTORBIKE',
-        'PENCIL', 'SUNGLASSES', 'MANGO', 'LAKE', 'BEER', 'SUBWAY', 'THEATRE',
-        'FLIP FLOPS', 'SHARK', 'SUMMER', 'BASEBALL', 'CANARY', 'SOCCER',
-        'LEOPARD', 'SKETCH', 'HILL', 'BLUES', 'JUNGLE', 'PEBBLE', 'LANTERN',
-        'BALLOON', 'WATCH', 'CANDY', 'RUM', 'RHINO', 'BLOG', 'FORK', 'CLOUD',
-        'BINOCULARS', 'YACHT', 'PARK', 'PIE', 'APE', 'RAZOR', 'LAKE',
-        'SMARTPHONE', 'HORSE', 'FOOTBALL', 'SQUASH', 'LAPTOP', 'OVEN'
-    ]
+SELECT_PLAYERS, SELECT_ROLES, SELECTING_CARDS, P_HAS_CARD, HANDLE_ELIMINATION, GAME_OVER, ASK_NAME, ADD_NAME, NAME_DEFAULT, SELECT_CARD, END_GAME = range(11)
+
+# Game data is kept per chat in a GameState stored in context.chat_data['game']
+@dataclass(slots=True)
+class GameState:
+    num_players: int = 0
+    num_civilians: int = 0
+    num_undercovers: int = 0
+    num_mr_white: int = 0
+    role_list: list = field(default_factory=list)
+    # Per-player data is stored as parallel sequences indexed by player_id - 1;
+    # the numeric columns are typed arrays rather than lists of int objects
+    names: list = field(default_factory=list)
+    roles: list = field(default_factory=list)
+    cards: array = field(default_factory=lambda: array('b'))
+    words: list = field(default_factory=list)
+    eliminated: array = field(default_factory=lambda: array('b'))
+    scores: array = field(default_factory=lambda: array('i'))
+    # Player indices per role, in seat order, rebuilt whenever roles are dealt
+    role_indices: dict = field(default_factory=dict)
+    # Players still in the round per role, decremented on each elimination
+    alive: dict = field(default_factory=dict)
+    # Elimination button dicts for the players still in, built once per round
+    elim_buttons: list = field(default_factory=list)
+    # Bit i is set once card i has been drawn
+    taken_cards: int = 0
+    selected_cards: list = field(default_factory=list)
+    player_order: list = field(default_factory=list)
+    # Turn tracking lives here too: in a group each tap comes from a different user
+    current_player: int = 1
+    next_player: int = 1
+    talking_order: list = field(default_factory=list)
+    sequence: list = field(default_factory=list)
+    chosen_word_pair: dict = field(default_factory=lambda: {'C': None, 'U': None})
+    # Each chat draws from its own generator instead of the module-global one
+    rng: random.Random = field(default_factory=random.Random)
+
+# Word pairs are matched by index: WORDS_C[i] goes with WORDS_U[i]
+WORDS_C = (
+    'DOG', 'ICE CREAM', 'MEATBALLS', 'KUNG FU', 'CAMPING', 'COCA COLA', 'CAR',
+    'GUITAR', 'SUNRISE', 'RIVER', 'APPLE', 'TEA', 'FORK', 'CHAIR', 'PIZZA',
+    'LAPTOP', 'HAT', 'OWL', 'SNOW', 'LAKE', 'OCEAN', 'ROSE', 'SKATEBOARD',
+    'SOFA', 'TENNIS', 'COW', 'BOOK', 'BICYCLE', 'PEN', 'GLASSES', 'BANANA',
+    'BEACH', 'WINE', 'TRAIN', 'CINEMA', 'SANDALS', 'FISH', 'WINTER', 'GOLF',
+    'PARROT', 'VOLLEYBALL', 'TIGER', 'PAINTING', 'MOUNTAIN', 'JAZZ', 'FOREST',
+    'ROCK', 'CANDLE', 'KITE', 'CLOCK', 'CHOCOLATE', 'WHISKEY', 'ELEPHANT',
+    'NEWSPAPER', 'RAINBOW', 'CAMERA', 'SAILBOAT', 'GARDEN', 'CAKE', 'MONKEY',
+    'SCISSORS', 'CELLPHONE', 'ZEBRA', 'RUGBY', 'PUMPKIN', 'COMPUTER', 'STOVE'
+)
+WORDS_U = (
+    'WOLF', 'YOGHURT', 'CHICKEN NUGGETS', 'KARATE', 'PICNIC', 'FANTA',
+    'TRUCK', 'VIOLIN', 'SUNSET', 'STREAM', 'PEAR', 'COFFEE', 'SPOON', 'STOOL',
+    'BURGER', 'TABLET', 'CAP', 'EAGLE', 'RAIN', 'POND', 'SEA', 'TULIP',
+    'ROLLERBLADES', 'ARMCHAIR', 'BADMINTON', 'BULL', 'MAGAZINE', 'MOTORBIKE',
+    'PENCIL', 'SUNGLASSES', 'MANGO', 'LAKE', 'BEER', 'SUBWAY', 'THEATRE',
+    'FLIP FLOPS', 'SHARK', 'SUMMER', 'BASEBALL', 'CANARY', 'SOCCER',
+    'LEOPARD', 'SKETCH', 'HILL', 'BLUES', 'JUNGLE', 'PEBBLE', 'LANTERN',
+    'BALLOON', 'WATCH', 'CANDY', 'RUM', 'RHINO', 'BLOG', 'CLOUD',
+    'BINOCULARS', 'YACHT', 'PARK', 'PIE', 'APE', 'RAZOR', 'SMARTPHONE',
+    'HORSE', 'FOOTBALL', 'SQUASH', 'LAPTOP', 'OVEN'
+)
+assert len(WORDS_C) == len(WORDS_U), "every civilian word needs an undercover word"
+
+# Pair civilian and undercover words once
+WORD_PAIRS = tuple(zip(WORDS_C, WORDS_U))
+
+# Points each winning player earns for their role
+ROLE_POINTS = {'C': 1, 'U': 2, 'W': 4}
+
+# Cards and player counts never exceed 10, so stringify them once
+CARD_STR = tuple(str(i) for i in range(11))
+# Callback data is prefixed per action so each state's handler matches only its own buttons
+CARD_DATA = tuple(f"card:{i}" for i in range(11))
+ELIM_DATA = tuple(f"elim:{i}" for i in range(11))
+# Per-turn keyboards are sent as plain reply_markup dicts, skipping the
+# InlineKeyboardButton/InlineKeyboardMarkup objects and their to_dict() pass
+CARD_BUTTONS = tuple({'text': CARD_STR[i], 'callback_data': CARD_DATA[i]} for i in range(11))
+
+# Keyboards only depend on the number of players, so build them once at import
+PLAYER_COUNT_KEYBOARD = InlineKeyboardMarkup.from_row(
+    [InlineKeyboardButton(CARD_STR[i], callback_data=CARD_STR[i]) for i in range(3, 11)]
+)
+ROLES_KEYBOARDS = {
+    3: InlineKeyboardMarkup([
+        [InlineKeyboardButton("2C, 1U, 0W", callback_data="2C1U0W")],
+        [InlineKeyboardButton("2C, 0U, 1W", callback_data="2C0U1W")],
+    ]),
+    4: InlineKeyboardMarkup([
+        [InlineKeyboardButton("3C, 1U, 0W", callback_data="3C1U0W")],
+        [InlineKeyboardButton("2C, 1U, 1W", callback_data="2C1U1W")],
+    ]),
+    5: InlineKeyboardMarkup([
+        [InlineKeyboardButton("3C, 1U, 1W", callback_data="3C1U1W")],
+        [InlineKeyboardButton("2C, 2U, 1W", callback_data="2C2U1W")],
+    ]),
+    6: InlineKeyboardMarkup([
+        [InlineKeyboardButton("3C, 2U, 1W", callback_data="3C2U1W")],
+        [InlineKeyboardButton("2C, 2U, 2W", callback_data="2C2U2W")],
+    ]),
+    7: InlineKeyboardMarkup([
+        [InlineKeyboardButton("4C, 2U, 1W", callback_data="4C2U1W")],
+        [InlineKeyboardButton("3C, 2U, 2W", callback_data="3C2U2W")],
+    ]),
+    8: InlineKeyboardMarkup([
+        [InlineKeyboardButton("5C, 2U, 1W", callback_data="5C2U1W")],
+        [InlineKeyboardButton("4C, 2U, 2W", callback_data="4C2U2W")],
+    ]),
+    9: InlineKeyboardMarkup([
+        [InlineKeyboardButton("5C, 3U, 1W", callback_data="5C3U1W")],
+        [InlineKeyboardButton("4C, 3U, 2W", callback_data="4C3U2W")],
+    ]),
+    10: InlineKeyboardMarkup([
+        [InlineKeyboardButton("5C, 3U, 2W", callback_data="5C3U2W")],
+        [InlineKeyboardButton("4C, 4U, 2W", callback_data="4C4U2W")],
+    ]),
 }
 
 def start(update: Update, context: CallbackContext) -> int:
-    print(f'initiated bot, update=  context= ')
-    keyboard = [
-        [InlineKeyboardButton(str(i), callback_data=str(i)) for i in range(3, 11)]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    update.message.reply_text("How many players? (3-10)", reply_markup=reply_markup)
-    print(f'Asking player amount, update= ')
+    logger.debug("initiated bot")
+    context.chat_data['game'] = GameState()
+    update.message.reply_text("How many players? (3-10)", reply_markup=PLAYER_COUNT_KEYBOARD)
+    logger.debug("Asking player amount")
     return SELECT_PLAYERS
 
 def select_players(update: Update, context: CallbackContext) -> int:
     query = update.callback_query
-    global num_players
-    global player_dict
-    global available_cards
-    num_players = int(query.data)
-    available_cards = list(range(1, num_players + 1))
-    print(f"logged amount of players at {num_players}")
-
-    # Create entries for each player in the dictionary
-    for i in range(1, num_players + 1):
-        player_dict[i] = {'name': '', 'role': '', 'card': 0, 'word': '', 'eliminated': False, 'score': 0}
-    context.user_data['current_player'] = 1
+    query.answer()
+    g = context.chat_data['game']
+    num_players = g.num_players = int(query.data)
+    g.taken_cards = 0
+    logger.debug("logged amount of players at %s", num_players)
+
+    # Create entries for each player
+    g.names = [''] * num_players
+    g.roles = [''] * num_players
+    g.cards = array('b', [0]) * num_players
+    g.words = [''] * num_players
+    g.eliminated = array('b', [0]) * num_players
+    g.scores = array('i', [0]) * num_players
+    g.current_player = 1
 
     # Move to the roles selection state
-    query.message.reply_text("How do you want to distribute the roles?", reply_markup=get_roles_keyboard(num_players))
-    print("asking about distribution")
+    query.edit_message_text("How do you want to distribute the roles?", reply_markup=ROLES_KEYBOARDS[num_players])
+    logger.debug("asking about distribution")
 
     return SELECT_ROLES
 
-def get_roles_keyboard(num_players):
-    if num_players == 3:
-        keyboard = [
-            [InlineKeyboardButton("2C, 1U, 0W", callback_data="2C1U0W")],
-            [InlineKeyboardButton("2C, 0U, 1W", callback_data="2C0U1W")],
-        ]
-    elif num_players == 4:
-        keyboard = [
-            [InlineKeyboardButton("3C, 1U, 0W", callback_data="3C1U0W")],
-            [InlineKeyboardButton("2C, 1U, 1W", callback_data="2C1U1W")],
-        ]
-    elif num_players == 5:
-        keyboard = [
-            [InlineKeyboardButton("3C, 1U, 1W", callback_data="3C1U1W")],
-            [InlineKeyboardButton("2C, 2U, 1W", callback_data="2C2U1W")],
-        ]
-    elif num_players == 6:
-        keyboard = [
-            [InlineKeyboardButton("3C, 2U, 1W", callback_data="3C2U1W")],
-            [InlineKeyboardButton("2C, 2U, 2W", callback_data="2C2U2W")],
-        ]
-    elif num_players == 7:
-        keyboard = [
-            [InlineKeyboardButton("4C, 2U, 1W", callback_data="4C2U1W")],
-            [InlineKeyboardButton("3C, 2U, 2W", callback_data="3C2U2W")],
-        ]
-    elif num_players == 8:
-        keyboard = [
-            [InlineKeyboardButton("5C, 2U, 1W", callback_data="5C2U1W")],
-            [InlineKeyboardButton("4C, 2U, 2W", callback_data="4C2U2W")],
-        ]
-    elif num_players == 9:
-        keyboard = [
-            [InlineKeyboardButton("5C, 3U, 1W", callback_data="5C3U1W")],
-            [InlineKeyboardButton("4C, 3U, 2W", callback_data="4C3U2W")],
-        ]
-    elif num_players == 10:
-        keyboard = [
-            [InlineKeyboardButton("5C, 3U, 2W", callback_data="5C3U2W")],
-            [InlineKeyboardButton("4C, 4U, 2W", callback_data="4C4U2W")],
-        ]
-    else:
-        # Invalid number of players, return to the start
-        query.message.reply_text("Invalid number of players.")
-        return SELECT_PLAYERS
-
-    # Implement the rest of the role distributions here based on num_players
-    # ...
-
-    return InlineKeyboardMarkup(keyboard)
-
 def select_roles(update: Update, context: CallbackContext) -> int:
-    global num_civilians
-    global num_players
-    global num_undercovers
-    global num_mr_white
-    global sequence
+    g = context.chat_data['game']
     query = update.callback_query
-    roles = query.data
-    print(f"logged roles as {query.data}")
-    num_civilians = int(roles[0])
-    num_undercovers = int(roles[2])
-    num_mr_white = int(roles[4])
+    query.answer()
+    distribution = query.data
+    logger.debug("logged roles as %s", query.data)
+    g.num_civilians = int(distribution[0])
+    g.num_undercovers = int(distribution[2])
+    g.num_mr_white = int(distribution[4])
 
-    # Assign roles to players randomly
-    players = list(range(1, num_players + 1))
-    random.shuffle(players)
-    for i in range(num_civilians):
-        player_dict[players[i]]['role'] = 'C'
-    for i in range(num_civilians, num_civilians + num_undercovers):
-        player_dict[players[i]]['role'] = 'U'
-    for i in range(num_civilians + num_undercovers, num_civilians + num_undercovers + num_mr_white):
-        player_dict[players[i]]['role'] = 'W'
-
-    # Convert the player_dict values to a list so we can manipulate the order
-    players_list = list(player_dict.values())
-    print(f"players list{players_list}")
-
-    # Find the index of the player with role 'W'
-    index_w = next((i for i, player in enumerate(players_list) if player['role'] == 'W'), None)
-    print(f"index_W{index_w}")
-    if index_w == None:
-        index_w = next((i for i, player in enumerate(players_list) if player['role'] == 'U'), None)
-    if index_w is not None:
-        # Determine the number of positions to move down based on the number of players
-        max_shift = num_players - 1  # No restrictions other than not being the first one
-        print(f"max shift at {num_players} players is {max_shift} positions")
-        shift = random.randint(1, max_shift)
-        print(f"after random, true shift is {shift}")
-
-        # Rotate the list so that 'W' is shifted down by 'shift' positions
-        new_start_index = (index_w + shift) % num_players
-        reordered_players = players_list[new_start_index:] + players_list[:new_start_index]
-
-        # Generate a sequence of player names
-        sequence = [player['name'] for player in reordered_players]
-        print("Player sequence:", sequence)
-
-    # Create player order for elimination
-    global player_order
-    print(f"player order: {players}")
-    player_order = players.copy()
-    player_order.remove(players[num_civilians + num_undercovers + num_mr_white - shift])
-    print(f"player order.remove: {player_order}")
-    player_order.insert(shift, players[num_civilians + num_undercovers + num_mr_white - shift])
-    print(f"player_order.insert{player_order}")
+    g.role_list = ['C'] * g.num_civilians + ['U'] * g.num_undercovers + ['W'] * g.num_mr_white
+    deal_roles(g)
 
     # Move to the selecting cards state
-    query.message.reply_text(f"Playing a game with {num_civilians} C, {num_undercovers} U, {num_mr_white} W")
-    context.user_data['next_player'] = 1
-    print(context.user_data)
-    show_card_keyboard(update, context)
+    query.edit_message_text(f"Playing a game with {g.num_civilians} C, {g.num_undercovers} U, {g.num_mr_white} W")
+    g.next_player = 1
+    return next_player_step(query.message, context)
 
+def deal_roles(g: GameState):
+    # Assign roles to players randomly
+    players = list(range(1, g.num_players + 1))
+    g.rng.shuffle(players)
+    for player_id, role in zip(players, g.role_list):
+        g.roles[player_id - 1] = role
+    g.role_indices = index_roles(g.roles)
+    g.alive = {role: len(indices) for role, indices in g.role_indices.items()}
+    logger.debug("roles %s", g.roles)
+
+    # Decide the talking order once; names are filled in when it is announced
+    talking_order, shift = compute_talking_order(g.role_indices, g.num_players, g.rng)
+    g.talking_order = talking_order
+
+    # Create player order for elimination: move the player at index last - shift
+    # to position shift, by index rather than by a value scan
+    logger.debug("player order: %s", players)
+    order = players.copy()
+    if shift:
+        order.insert(shift, order.pop(g.num_players - shift))
+    g.player_order = order
+    logger.debug("player_order %s", order)
+
+def index_roles(roles_list):
+    role_indices = {'C': [], 'U': [], 'W': []}
+    for i, role in enumerate(roles_list):
+        role_indices[role].append(i)
+    return role_indices
+
+def compute_talking_order(role_indices, n, rng=random):
+    # Find the index of the first player with role 'W', falling back to 'U'
+    first = role_indices['W'] or role_indices['U']
+    if not first:
+        return list(range(n)), 0
+    index_w = first[0]
+    logger.debug("index_W%s", index_w)
+
+    # Determine the number of positions to move down based on the number of players
+    max_shift = n - 1  # No restrictions other than not being the first one
+    logger.debug("max shift at %s players is %s positions", n, max_shift)
+    shift = rng.randint(1, max_shift)
+    logger.debug("after random, true shift is %s", shift)
+
+    # Rotate the player indices so that 'W' is shifted down by 'shift' positions
+    new_start_index = (index_w + shift) % n
+    order = list(range(new_start_index, n)) + list(range(new_start_index))
+    return order, shift
+
+def prompt_name(message: Message, player_id: int, edit: bool = False) -> int:
+    keyboard = [
+        [InlineKeyboardButton(f"Player {player_id}", callback_data="/name_default")],
+        [InlineKeyboardButton("Add name", callback_data="/add_name")],
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    send = message.edit_text if edit else message.reply_text
+    send(f'Player {player_id}, how do you want to be called ?', reply_markup=reply_markup)
     return SELECTING_CARDS
 
-def show_card_keyboard(update: Update, context: CallbackContext):
-    print("show_card_keyboard")
-    query = update.callback_query
-    current_player = context.user_data['next_player']
-    context.user_data['current_player'] = current_player
-    print(f"a round for our dear player ")
-    if query:
-        print(f"lol current query data is {query.data}")
-    print(f"lol current player_dict is {player_dict}")
-    if player_dict[current_player]['name'] == '':
-        print("Oh-oh mr noname")
-        keyboard = [
-            [InlineKeyboardButton(f"Player {current_player}", callback_data="/name_default")],
-            [InlineKeyboardButton("Add name", callback_data="/add_name")],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        query.message.reply_text(f'Player {current_player}, how do you want to be called ?', reply_markup=reply_markup)
-        query = update.callback_query
-        if query.data == "/name_default":
-            print(f"adding default Player name Player{current_player}")
-            query.message.reply_text(f'Player {current_player}, keep default name ?', reply_markup=reply_markup)
-            player_id = context.user_data['current_player']
-            player_name = f"Player {current_player}"
-            player_dict[player_id]['name'] = player_name
-            show_card_keyboard(update, context)
-            return SELECTING_CARDS
-            #return NAME_DEFAULT
-        elif query.data == "/add_name":
-            print(f"adding custom Player name for Player{current_player}")
-            query.message.reply_text("Please enter the game you want to use:", reply_markup = ForceReply(selective=True))  
-            #add_name(update, context)
-            return ADD_NAME
-        #return ASK_NAME
-    elif first_pass == False:
-        return SELECT_CARD
-    else:
-        print("Great, checking if mr yesname has his cards")
-        p_has_card(update, context)
-        return P_HAS_CARD
+def prompt_card(message: Message, g: GameState, player_id: int, edit: bool = False) -> int:
+    taken = g.taken_cards
+    logger.debug("taken cards = %s", bin(taken))
+    reply_markup = {'inline_keyboard': [[
+        CARD_BUTTONS[card]
+        for card in range(1, g.num_players + 1)
+        if not taken >> card & 1
+    ]]}
+    send = message.edit_text if edit else message.reply_text
+    send(f"Player {g.names[player_id - 1]}, choose your card:", reply_markup=reply_markup)
+    return SELECT_CARD
+
+def next_player_step(message: Message, context: CallbackContext, edit: bool = False) -> int:
+    # Ask the next player for a name first, then for a card; with edit=True the
+    # prompt replaces the tapped message instead of posting a new one
+    g = context.chat_data['game']
+    current_player = g.current_player = g.next_player
+    if g.names[current_player - 1] == '':
+        return prompt_name(message, current_player, edit)
+    return prompt_card(message, g, current_player, edit)
 
 def ask_name(update: Update, _: CallbackContext) -> int:
-    print('asking name')
-    update.callback_query.message.reply_text("Please enter the name you want to add:", reply_markup = ForceReply(selective=True))
-    add_name(update, Message)  
+    logger.debug("asking name")
+    update.callback_query.answer()
+    update.callback_query.message.reply_text("Please enter the name you want to use:", reply_markup=ForceReply(selective=True))
     return ADD_NAME
 
-def name_default(update: Update, context: CallbackContext):
-    print("name_default")
-    player_id = context.user_data['current_player']
-    print(f"Player {player_id} shall henceforth be knowneth as:")
-    update.message.text = f"Player {player_id}"
-    player_name = update.message.text
-    print(player_name)
-    #player_dict[current_player]['name'] = f"Player {current_player}"
-    player_dict[player_id]['name'] = player_name
-    print("returning to see if there is a name now")
+def name_default(update: Update, context: CallbackContext) -> int:
+    logger.debug("name_default")
+    g = context.chat_data['game']
+    player_id = g.current_player
+    player_name = f"Player {player_id}"
+    logger.debug("Player %s shall henceforth be knowneth as: %s", player_id, player_name)
+    g.names[player_id - 1] = player_name
     # Proceed to card selection after name input
-    show_card_keyboard(update, context)
-    return SELECTING_CARDS
+    update.callback_query.answer()
+    return prompt_card(update.callback_query.message, g, player_id, edit=True)
 
 def add_name(update: Update, context: CallbackContext):
-    print("adding any name other than kevin")
+    logger.debug("adding any name other than kevin")
+    g = context.chat_data['game']
     # Handle name input and store it in the player dictionary
-    player_id = context.user_data['current_player']
-    print(f"player {player_id} shall henceforth be knowneth as:")
+    player_id = g.current_player
+    logger.debug("player %s shall henceforth be knowneth as:", player_id)
     player_name = update.message.text#.strip()
-    print(player_name)
-    player_dict[player_id]['name'] = player_name
-    print("returning to see if there is a name now")
+    logger.debug("name %s", player_name)
+    g.names[player_id - 1] = player_name
+    logger.debug("returning to see if there is a name now")
     # Proceed to card selection after name input
-    show_card_keyboard(update, context)
-    return SELECTING_CARDS
-
-def p_has_card(update: Update, context: CallbackContext):
-    global first_pass
-    global available_cards
-    print("p_has_card")
-    print(f'first_pass = {first_pass}')
-    query = update.callback_query
-    print("so we are here to see if there is a card and the query states:")
-    print(f"and the update")
-    current_player = context.user_data['current_player']
-    if player_dict[current_player]['card'] != 0:
-        print("player has a card and word already")
-        context.user_data['next_player'] = current_player + 1
-        show_card_keyboard(update, context)
-        return SELECTING_CARDS
-    elif first_pass == True:
-        first_pass = False
-        message = update.message
-        print(f"and the message is great and loud: {message}")
-        print("player doesnt have a card and word")
-        print(f"available cards = {available_cards}")
-        keyboard = [
-              [InlineKeyboardButton(str(card), callback_data=str(card)) for card in available_cards]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        if message is not None:
-            message.reply_text(f"Player {player_dict[current_player]['name']}, choose your card:", reply_markup=reply_markup)
-        else:
-            query.message.reply_text(f"Player {player_dict[current_player]['name']}, choose your card:", reply_markup=reply_markup)
-        print("returning SELECT_CARD from elif first_pass == True")
-        return SELECT_CARD
-    print("returning SELECT_CARD from elif p_has_card")
-    return SELECT_CARD
+    return prompt_card(update.message, g, player_id)
 
 def select_card(update: Update, context: CallbackContext) -> int:
-    global sequence
-    global available_cards
-    print("select_card")
+    logger.debug("select_card")
+    g = context.chat_data['game']
+    # Bind hot attributes to locals once per call
+    _names = g.names
+    _roles = g.roles
     #print(update)
     query = update.callback_query
-    card = int(query.data)
-    current_player = context.user_data['current_player']
-    print(f"{current_player} chose {card}")
+    query.answer()
+    card = int(query.data[5:])
+    current_player = g.current_player
+    logger.debug("%s chose %s", current_player, card)
 
     # Store the selected card for the current player
-    player_dict[current_player]['card'] = card
-    selected_cards.append(card)
-    print(selected_cards)
-    available_cards.remove(card)
-    print (f"available cards= {available_cards}")
+    g.cards[current_player - 1] = card
+    g.selected_cards.append(card)
+    logger.debug("selected cards %s", g.selected_cards)
+    g.taken_cards |= 1 << card
 
     # Inform the player of their role and associated word
-    role = player_dict[current_player]['role']
-    global chosen_word_pair  # Declare chosen_word_pair as global to modify it
+    role = _roles[current_player - 1]
+    chosen_word_pair = g.chosen_word_pair
 
     if role == 'C' or role == 'U':
         if chosen_word_pair['C'] is None:  # If no word has been chosen yet
             # Randomly select a new word pair
-            index = random.randint(0, len(words_library['C']) - 1)
-            chosen_word_pair['C'] = words_library['C'][index]
-            chosen_word_pair['U'] = words_library['U'][index]
+            chosen_word_pair['C'], chosen_word_pair['U'] = g.rng.choice(WORD_PAIRS)
         word = chosen_word_pair[role]
     else:
         word = "not, because you're Mr. White"  # Mr. White gets no word
     '''if role == 'C':
-        word = random.choice(words_library['C'])
+        word = random.choice(WORDS_C)
     elif role == 'U':
-        word = random.choice(words_library['U'])
+        word = random.choice(WORDS_U)
     else:
         word = "not, because you're Mr. White"  # Mr. White gets no word'''
-    player_dict[current_player]['word'] = word
-    query.message.reply_text(f"{player_dict[current_player]['name']}, your word is {word}")
-    print(f'current = {current_player}')
-    print(context.user_data)
-    context.user_data['next_player'] += 1
-    print(f'current = {current_player}')
-    print(context.user_data)
-    global first_pass
-    first_pass = True
+    g.words[current_player - 1] = word
+    query.edit_message_text(f"{_names[current_player - 1]}, your word is {word}")
+    g.next_player += 1
+    logger.debug("current = %s, next = %s", current_player, g.next_player)
 
     # Move to the next player or start elimination if all players have chosen a card
-    if len([player for player in player_dict.values() if player['card'] == 0]) == 0:
-        print("Gaslight eachother")
-         # Display the order in which players describe their word
-        # Convert the player_dict values to a list so we can manipulate the order
-        players_list = list(player_dict.values())
-        print(f"players list{players_list}")
-
-        # Find the index of the player with role 'W'
-        index_w = next((i for i, player in enumerate(players_list) if player['role'] == 'W'), None)
-        print(f"index_W{index_w}")
-        if index_w == None:
-            index_w = next((i for i, player in enumerate(players_list) if player['role'] == 'U'), None)
-        if index_w is not None:
-            # Determine the number of positions to move down based on the number of players
-            max_shift = num_players - 1  # No restrictions other than not being the first one
-            print(f"max shift at {num_players} players is {max_shift} positions")
-            shift = random.randint(1, max_shift)
-            print(f"after random, true shift is {shift}")
-
-            # Rotate the list so that 'W' is shifted down by 'shift' positions
-            new_start_index = (index_w + shift) % num_players
-            reordered_players = players_list[new_start_index:] + players_list[:new_start_index]
-
-            # Generate a sequence of player names
-            sequence = [player['name'] for player in reordered_players]
-            print("Player sequence:", sequence)
-            query.message.reply_text(f"The order of players talking: {sequence}")
-
+    if 0 not in g.cards:
+        logger.debug("Gaslight eachother")
+        # Display the order decided in select_roles in which players describe their word
+        g.sequence = [_names[i] for i in g.talking_order]
+        logger.debug("Player sequence: %s", g.sequence)
+        query.message.reply_text(f"The order of players talking: {g.sequence}")
+
+        g.elim_buttons = [
+            {'text': name, 'callback_data': ELIM_DATA[player_id]}
+            for player_id, name in enumerate(_names, 1)
+        ]
         eliminate_player(update, context)
         return HANDLE_ELIMINATION
     else:
-        show_card_keyboard(update, context)
-        return SELECTING_CARDS
+        return next_player_step(query.message, context)
 
 def eliminate_player(update: Update, context: CallbackContext):
     query = update.callback_query
 
     # Show a keyboard with remaining active players to eliminate
-    remaining_players = [player for player in player_dict.values() if not player['eliminated']]
-    keyboard = [
-        [InlineKeyboardButton(f"{player['name']}", callback_data=str(player['name']))] for player in remaining_players
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    reply_markup = {'inline_keyboard': [[button] for button in context.chat_data['game'].elim_buttons]}
     query.message.reply_text("Select a player to eliminate:", reply_markup=reply_markup)
 
     return HANDLE_ELIMINATION
 
 def handle_elimination(update: Update, context: CallbackContext): #-> int:
     query = update.callback_query
-    player_name = query.data
+    g = context.chat_data['game']
+    # Bind hot attributes to locals once per call
+    _roles = g.roles
+    _eliminated = g.eliminated
+    _scores = g.scores
+    reply_text = query.message.reply_text
+    query.answer()
 
-    # Find the corresponding player_id for the given player_name
-    player_id = None
-    for id_, player in player_dict.items():
-        if player['name'] == player_name:
-            player_id = id_
-            break
+    player_id = int(query.data[5:])
 
     # Eliminate the selected player
-    player_dict[player_id]['eliminated'] = True
+    _eliminated[player_id - 1] = True
+    g.elim_buttons = [b for b in g.elim_buttons if b['callback_data'] != query.data]
 
     # Communicate elimination 
-    if player_dict[player_id]['role'] == 'C':
-        query.message.reply_text("A civilian has been eliminated")
-    if player_dict[player_id]['role'] == 'U':
-        query.message.reply_text("An undercover has been eliminated")
-    if player_dict[player_id]['role'] == 'W':
-        query.message.reply_text("Mr. White has been eliminated")
+    eliminated_role = _roles[player_id - 1]
+    # Turn the elimination prompt into the announcement so its buttons can't be tapped again
+    if eliminated_role == 'C':
+        query.edit_message_text("A civilian has been eliminated")
+    if eliminated_role == 'U':
+        query.edit_message_text("An undercover has been eliminated")
+    if eliminated_role == 'W':
+        query.edit_message_text("Mr. White has been eliminated")
 
     # Check if all infiltrators (undercover or mr white) have been eliminated
-    infiltrators_remaining = len([player for player in player_dict.values() if
-                                  not player['eliminated'] and player['role'] in ('U', 'W')])
-    civilians_remaining = len([player for player in player_dict.values() if
-                               not player['eliminated'] and player['role'] == 'C'])
-    mr_white_remaining = len([player for player in player_dict.values() if
-                              not player['eliminated'] and player['role'] == 'W'])
-
-    if mr_white_remaining == 0 and infiltrators_remaining > 0:
-        # Mr. White is eliminated, civilians win
-        query.message.reply_text("Mr. White has been eliminated. But infiltrators remain.")
-        eliminate_player(update, context)
-    elif infiltrators_remaining == 0:
+    alive = g.alive
+    alive[eliminated_role] -= 1
+    civilians_remaining = alive['C']
+    infiltrators_remaining = alive['U'] + alive['W']
+
+    if infiltrators_remaining == 0:
         # All infiltrators are eliminated, civilians win
-        query.message.reply_text("All infiltrators have been eliminated. Civilians win this round!")
-        for player in player_dict.values():
-            if player['role'] == 'C':
-                player['score'] += 1
-            elif player['role'] == 'U':
-                player['score'] += 0
-            elif player['role'] == 'W':
-                player['score'] += 0
-        end_round(update, context)
-        return END_ROUND
+        reply_text("All infiltrators have been eliminated. Civilians win this round!")
+        points = ROLE_POINTS['C']
+        for i in g.role_indices['C']:
+            _scores[i] += points
+        return end_round(update, context)
     elif civilians_remaining == 0:
-        query.message.reply_text("All civilians have been eliminated. Infiltrators win this round!")
-        for player in player_dict.values():
-            if player['role'] == 'C':
-                player['score'] += 0
-            elif player['role'] == 'U' and not player['eliminated'] == True:
-                player['score'] += 2
-            elif player['role'] == 'W' and not player['eliminated'] == True:
-                player['score'] += 4
-        end_round(update, context)
-        return END_ROUND
-    elif mr_white_remaining == 0 and civilians_remaining == 0 and infiltrators_remaining > 0:
-        query.message.reply_text("All civilians have been eliminated. Undercovers win this round!")
-        end_round(update, context)
-        return END_ROUND
+        reply_text("All civilians have been eliminated. Infiltrators win this round!")
+        for role in ('U', 'W'):
+            points = ROLE_POINTS[role]
+            for i in g.role_indices[role]:
+                if not _eliminated[i]:
+                    _scores[i] += points
+        return end_round(update, context)
+    elif eliminated_role == 'W':
+        # Mr. White is out but undercovers remain, so the round goes on
+        reply_text("Mr. White has been eliminated. But infiltrators remain.")
+        eliminate_player(update, context)
     else:
         # There are remaining infiltrators, continue the elimination
         eliminate_player(update, context)
 
 def end_round(update: Update, context: CallbackContext):
-    print("end_round")
-    global standings
+    logger.debug("end_round")
+    g = context.chat_data['game']
     query = update.callback_query
-    # Calculate and display the standings
-    for player_id in player_dict.keys():
-        name = player_dict[player_id]['name']
-        score = player_dict[player_id]['score']
-        standings.append(f"{name}: {score} points")
-    print(f"bare standings:\n {standings}")
-    # Sort players by score in descending order
-    sorted_players = sorted(player_dict.items(), key=lambda x: x[1]['score'], reverse=True)
-    sorted_standings = []
-    for player_id, player_info in sorted_players:
-        name = player_info['name']
-        score = player_info['score']
-        sorted_standings.append(f"{name}: {score} points")
-    print(f"sorted standings :\n {standings}")
-    # To print or further manipulate 'standings'
-    print(standings)
+    _names = g.names
+    _scores = g.scores
+    # Sort players by score in descending order and display the standings
+    order = sorted(range(len(_scores)), key=_scores.__getitem__, reverse=True)
+    sorted_standings = [f"{_names[i]}: {_scores[i]} points" for i in order]
+    logger.debug("sorted standings :\n %s", sorted_standings)
     query.message.reply_text("\n".join(sorted_standings))
 
     keyboard = [
@@ -495,42 +437,50 @@ def end_round(update: Update, context: CallbackContext):
 
     reply_markup = InlineKeyboardMarkup(keyboard)
     query.message.reply_text("The round is over. Do you want to continue or end?", reply_markup=reply_markup)
-    end_game(update, context)
     return END_GAME
 
 def end_game(update: Update, context: CallbackContext):
-    print("end_game")
-    # Calculate and display the standings
-    global num_civilians
-    global num_undercovers
-    global num_mr_white
+    logger.debug("end_game")
+    g = context.chat_data.get('game')
+    if g is None:
+        # Nothing to reset, e.g. /end before a game was started
+        return ConversationHandler.END
     query = update.callback_query
-    if query == "Yes":
-        print("yey")
-        for players[i], player_info in player_dict.items():
-            player_info['role'] = None
-            player_info['card'] = 0
-            player_info['word'] = None
-        # Assign roles to players randomly
-        players = list(range(1, num_players + 1))
-        random.shuffle(players)
-        for i in range(num_civilians):
-            player_dict[players[i]]['role'] = 'C'
-        for i in range(num_civilians, num_civilians + num_undercovers):
-            player_dict[players[i]]['role'] = 'U'
-        for i in range(num_civilians + num_undercovers, num_civilians + num_undercovers + num_mr_white):
-            player_dict[players[i]]['role'] = 'W'
-        return SELECTING_CARDS
-    if query == "No":
-        print("bye")
-        query.message.reply_text("GAME OVER")
-        start
-        return SELECT_PLAYERS
+    if query is not None:
+        query.answer()
+    if query is not None and query.data == "Yes":
+        logger.debug("yey")
+        # Same players and distribution: clear the round and deal new roles and words
+        num_players = g.num_players
+        g.cards = array('b', [0]) * num_players
+        g.words = [''] * num_players
+        g.eliminated = array('b', [0]) * num_players
+        g.taken_cards = 0
+        g.selected_cards.clear()
+        g.chosen_word_pair = {'C': None, 'U': None}
+        deal_roles(g)
+        g.next_player = 1
+        return next_player_step(query.message, context, edit=True)
+    # "No" or /end: drop the game so /start begins a fresh one
+    logger.debug("bye")
+    del context.chat_data['game']
+    if query is not None:
+        query.edit_message_text("GAME OVER. Send /start to play again.")
+    else:
+        update.effective_message.reply_text("GAME OVER. Send /start to play again.")
+    return ConversationHandler.END
 
 def main(bot_token):
     # Set up the Telegram Bot token
 
-    updater = Updater(bot_token)
+    # Game messages are acknowledgements, so don't quote or ping for each one
+    defaults = Defaults(quote=False, disable_notification=True)
+    updater = Updater(
+        bot_token,
+        workers=WORKERS,
+        request_kwargs={'con_pool_size': WORKERS + 4},
+        defaults=defaults,
+    )
     dp = updater.dispatcher
 
     # Define conversation handler
@@ -539,28 +489,40 @@ def main(bot_token):
         states={
             SELECT_PLAYERS: [CallbackQueryHandler(select_players)],
             SELECT_ROLES: [CallbackQueryHandler(select_roles)],
-            SELECT_CARD: [CallbackQueryHandler(select_card)],
-            SELECTING_CARDS: [CallbackQueryHandler(show_card_keyboard)],
-            P_HAS_CARD: [CallbackQueryHandler(p_has_card)],
-            HANDLE_ELIMINATION: [CallbackQueryHandler(handle_elimination), CallbackQueryHandler(handle_elimination)],
+            SELECT_CARD: [CallbackQueryHandler(select_card, pattern=r'^card:')],
+            # The dispatcher matches the button data, so each handler needs no branching
+            SELECTING_CARDS: [
+                CallbackQueryHandler(name_default, pattern=r'^/name_default$'),
+                CallbackQueryHandler(ask_name, pattern=r'^/add_name$'),
+            ],
+            HANDLE_ELIMINATION: [CallbackQueryHandler(handle_elimination, pattern=r'^elim:')],
             #GAME_OVER: [MessageHandler(Filters.text & ~Filters.command, end_game)],
             #SELECTING_NAME: [CallbackQueryHandler(handle_name_input)],
-            ASK_NAME: [CommandHandler('add_name', ask_name)],
-            NAME_DEFAULT: [CommandHandler('name_default', name_default)],
             ADD_NAME: [MessageHandler(Filters.text, add_name)],
             #    CommandHandler('addname', add_name),
             #    MessageHandler(Filters.text & ~Filters.command, handle_name_input),],
             #SELECTING_NAME: [MessageHandler(Filters.text & ~Filters.command, handle_name_input)],
-            END_ROUND: [CallbackQueryHandler(end_round)],
-            END_GAME: [CallbackQueryHandler(end_game)],
+            END_GAME: [CallbackQueryHandler(end_game, pattern=r'^(Yes|No)$')],
         },
         fallbacks=[CommandHandler('end', end_game)],
+        # ADD_NAME waits for a text message, so this can't be per_message
         per_message=False,
+        # One game per chat: every member of the group taps through the same conversation
+        per_user=False,
     )
     dp.add_handler(conv_handler)
 
     # Start the Bot
-    updater.start_polling()
+    if WEBHOOK_URL:
+        # The token doubles as a secret path so only Telegram can post updates
+        updater.start_webhook(
+            listen='0.0.0.0',
+            port=WEBHOOK_PORT,
+            url_path=bot_token,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{bot_token}",
+        )
+    else:
+        updater.start_polling(timeout=POLL_TIMEOUT)
     updater.idle()
 
 
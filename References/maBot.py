@@ -1,7 +1,13 @@
+import asyncio
 import json
 import logging
+import os
+import re
 import pytz
-from datetime import datetime, timedelta
+from collections import deque
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from operator import itemgetter
 
 from telegram import (
     Update, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove,
@@ -26,22 +32,204 @@ from config import BOT_HANDLER_ID
 
 # Data storage
 DATA_FILE = "wg_data_beta.json"
+# Expenses only ever grow, so they live in an append-only JSON-lines file
+EXPENSES_FILE = "wg_expenses_beta.jsonl"
+DATA_FILE_BUFFER = 64 * 1024
+# Pretty-print the data file for manual inspection; compact output is smaller and faster
+PRETTY_JSON = False
+
+
+# Parsed contents of DATA_FILE and EXPENSES_FILE, loaded once and kept in memory between updates
+_CACHE = {"data": None, "expenses": None}
+# Most recent expenses for list_expenses, so it never needs the full history
+_RECENT = {"expenses": None}
 
 
 def load_data():
+    if _CACHE["data"] is not None:
+        return _CACHE["data"]
     try:
-        with open(DATA_FILE, "r") as file:
-            return json.load(file)
+        with open(DATA_FILE, "rb", buffering=DATA_FILE_BUFFER) as file:
+            data = json.loads(file.read())
     except (FileNotFoundError, json.JSONDecodeError):
-        default_data = {"expenses": [], "chores": {}, "penalties": {}, "members": []}
-        with open(DATA_FILE, "w") as file:
-            json.dump(default_data, file, indent=4)
-        return default_data
+        data = {}
+    # Guarantee every section exists so handlers can subscript without defaults
+    for section in ("members", "chores", "penalties", "last_week_violators"):
+        data.setdefault(section, {})
+    if "expenses" in data:
+        _migrate_expenses(data)
+    if _normalize_member_keys(data) or not os.path.exists(DATA_FILE):
+        save_data(data)
+    _CACHE["data"] = data
+    return data
+
+
+def member_key(name):
+    # Members, chores, penalties and violators are all keyed by this normalized name;
+    # casefold also matches names that only differ in Unicode case (e.g. "ß" vs "SS")
+    return name.casefold()
+
+
+def _normalize_member_keys(data):
+    # Older data files kept members as a list and keyed the other dicts by display name
+    changed = False
+    members = data["members"]
+    if isinstance(members, list):
+        members = {member_key(m): m for m in members}
+        changed = True
+    elif any(key != member_key(key) for key in members):
+        members = {member_key(key): name for key, name in members.items()}
+        changed = True
+    data["members"] = members
+
+    for section in ("chores", "penalties", "last_week_violators"):
+        values = data[section]
+        if all(key == member_key(key) for key in values):
+            continue
+        merged = {}
+        for name, value in values.items():
+            key = member_key(name)
+            if section == "last_week_violators":
+                merged[key] = True
+            else:
+                merged[key] = merged.get(key, 0) + value
+        data[section] = merged
+        changed = True
+    return changed
+
+
+def _migrate_expenses(data):
+    # Older data files kept the expenses inline; move them to EXPENSES_FILE
+    expenses = data.pop("expenses")
+    lines = [json.dumps(expense, separators=(",", ":")) + "\n" for expense in expenses]
+    if os.path.exists(EXPENSES_FILE):
+        # Left over from an interrupted migration or restored separately: append what
+        # it doesn't already hold rather than dropping the inline expenses
+        with open(EXPENSES_FILE, "r", buffering=DATA_FILE_BUFFER) as file:
+            existing = set(file)
+        with open(EXPENSES_FILE, "a") as file:
+            file.writelines(line for line in lines if line not in existing)
+    else:
+        tmp_file = EXPENSES_FILE + ".tmp"
+        with open(tmp_file, "w", buffering=DATA_FILE_BUFFER) as file:
+            file.writelines(lines)
+        os.replace(tmp_file, EXPENSES_FILE)
+    # Reload from the file on next use so the caches match what was written
+    _CACHE["expenses"] = None
+    _RECENT["expenses"] = None
+    save_data(data)
+
+
+def load_expenses():
+    if _CACHE["expenses"] is not None:
+        return _CACHE["expenses"]
+    expenses = []
+    try:
+        with open(EXPENSES_FILE, "r", buffering=DATA_FILE_BUFFER) as file:
+            for line in file:
+                if line.strip():
+                    expenses.append(json.loads(line))
+    except FileNotFoundError:
+        pass
+    _CACHE["expenses"] = expenses
+    return expenses
+
+
+def _read_last_lines(path, count, block_size=4096):
+    # Read backwards from the end of the file until enough lines are found
+    with open(path, "rb") as file:
+        file.seek(0, os.SEEK_END)
+        pos = file.tell()
+        chunk = b""
+        while pos > 0 and chunk.count(b"\n") <= count:
+            step = min(block_size, pos)
+            pos -= step
+            file.seek(pos)
+            chunk = file.read(step) + chunk
+    return [line for line in chunk.splitlines() if line.strip()][-count:]
+
+
+def load_recent_expenses():
+    if _RECENT["expenses"] is None:
+        recent = deque(maxlen=EXPENSE_LIST_LIMIT)
+        try:
+            recent.extend(
+                json.loads(line) for line in _read_last_lines(EXPENSES_FILE, EXPENSE_LIST_LIMIT)
+            )
+        except FileNotFoundError:
+            pass
+        _RECENT["expenses"] = recent
+    return _RECENT["expenses"]
+
+
+def append_expense(expense):
+    # Only the new record is written, however long the history gets
+    with open(EXPENSES_FILE, "a") as file:
+        file.write(json.dumps(expense, separators=(",", ":")) + "\n")
+    if _CACHE["expenses"] is not None:
+        _CACHE["expenses"].append(expense)
+    if _RECENT["expenses"] is not None:
+        _RECENT["expenses"].append(expense)
 
 
 def save_data(data):
-    with open(DATA_FILE, "w") as file:
-        json.dump(data, file, indent=4)
+    _CACHE["data"] = data
+    _DIRTY.clear()
+    # Write to a temp file first so a crash never leaves a half-written DATA_FILE
+    tmp_file = DATA_FILE + ".tmp"
+    if PRETTY_JSON:
+        payload = json.dumps(data, indent=4)
+    else:
+        payload = json.dumps(data, separators=(",", ":"))
+    with open(tmp_file, "wb", buffering=DATA_FILE_BUFFER) as file:
+        file.write(payload.encode())
+    os.replace(tmp_file, DATA_FILE)
+
+
+# Set when the cached data has changes that _flush_loop still has to write
+_DIRTY = asyncio.Event()
+SAVE_DELAY = 0.5
+
+
+def mark_dirty():
+    # For frequent, low-value writes; bursts within SAVE_DELAY become a single save
+    _DIRTY.set()
+
+
+async def _flush_loop():
+    while True:
+        await _DIRTY.wait()
+        await asyncio.sleep(SAVE_DELAY)
+        if _DIRTY.is_set():
+            try:
+                save_data(load_data())
+            except OSError:
+                # Keep the loop alive and retry on the next pass
+                logger.exception("Failed to save %s", DATA_FILE)
+                _DIRTY.set()
+
+
+# Handle of the running _flush_loop, cancelled on shutdown before the final save
+_FLUSH_TASK = None
+
+
+async def start_flush_loop(application):
+    # post_init runs before the application is started, so the task is tracked here
+    global _FLUSH_TASK
+    _FLUSH_TASK = asyncio.create_task(_flush_loop())
+
+
+async def flush_pending(application):
+    global _FLUSH_TASK
+    if _FLUSH_TASK is not None:
+        _FLUSH_TASK.cancel()
+        try:
+            await _FLUSH_TASK
+        except asyncio.CancelledError:
+            pass
+        _FLUSH_TASK = None
+    if _DIRTY.is_set():
+        save_data(load_data())
 
 
 # Callback data prefixes
@@ -50,9 +238,38 @@ CB_SPLIT_TOGGLE_PREFIX = "split_toggle:"
 CB_SPLIT_DONE = "split_done"
 CB_SPLIT_BACK = "split_back"
 CB_SPLIT_CANCEL = "split_cancel"
+_SPLIT_CALLBACKS = frozenset((CB_SPLIT_DONE, CB_SPLIT_BACK, CB_SPLIT_CANCEL))
+
+
+def is_payer_callback(data):
+    return data.startswith(CB_PAYER_PREFIX)
+
+
+def is_split_callback(data):
+    return data in _SPLIT_CALLBACKS or data.startswith(CB_SPLIT_TOGGLE_PREFIX)
+
+
+# Emoji shared by buttons and messages
+EMOJI_CHECK = "\N{WHITE HEAVY CHECK MARK}"
+EMOJI_BACK = "\N{LEFTWARDS BLACK ARROW}\N{VARIATION SELECTOR-16}"
+EMOJI_CANCEL = "\N{HEAVY MULTIPLICATION X}\N{VARIATION SELECTOR-16}"
+EMOJI_BEER = "\N{BEER MUG}"
+
+# Main keyboard button patterns, compiled once
+RX_ADD_EXPENSE = re.compile(r"^Add Expense$")
+RX_ADD_CHORE = re.compile(r"^Add Chore$")
+RX_LIST_EXPENSES = re.compile(r"^List Expenses$")
+RX_STANDINGS = re.compile(r"^Standings$")
+RX_BEER_OWED = re.compile(r"^Check Beer Owed$")
+RX_MANAGE_MEMBERS = re.compile(r"^Manage Members$")
+RX_WEEKLY_REPORT = re.compile(r"^Set Weekly Report$")
+RX_CANCEL = re.compile(r"^Cancel$")
 
 # Settings
 EXPENSE_LIST_LIMIT = 20
+REPORT_TZ = pytz.timezone("Europe/Berlin")
+# Amounts like 42, 42.5 or 42,50
+AMOUNT_RE = re.compile(r"\d+(?:[.,]\d{1,2})?")
 
 # States for conversation handler
 EXPENSE_DESCRIPTION, EXPENSE_AMOUNT, EXPENSE_PAYER, EXPENSE_SPLIT = range(4)
@@ -60,56 +277,78 @@ CHORE_USER, CHORE_MINUTES = range(2)
 MANAGE_MEMBER = range(1)
 
 
-# Dynamic Keyboards
-def get_main_keyboard():
-    return ReplyKeyboardMarkup(
+# Keyboards
+# The main keyboard never changes, so build it once
+_MAIN_KB = ReplyKeyboardMarkup(
+    [
         [
-            [
-                KeyboardButton("Add Expense"),
-                KeyboardButton("Add Chore"),
-                KeyboardButton("List Expenses"),
-            ],
-            [
-                KeyboardButton("Standings"),
-                KeyboardButton("Check Beer Owed"),
-                KeyboardButton("Manage Members"),
-            ],
-            [KeyboardButton("Set Weekly Report"), KeyboardButton("Cancel")],
+            KeyboardButton("Add Expense"),
+            KeyboardButton("Add Chore"),
+            KeyboardButton("List Expenses"),
         ],
-        resize_keyboard=True,
-    )
+        [
+            KeyboardButton("Standings"),
+            KeyboardButton("Check Beer Owed"),
+            KeyboardButton("Manage Members"),
+        ],
+        [KeyboardButton("Set Weekly Report"), KeyboardButton("Cancel")],
+    ],
+    resize_keyboard=True,
+)
+
+_SPLIT_CONTROL_ROW = (
+    InlineKeyboardButton(f"{EMOJI_BACK} Back", callback_data=CB_SPLIT_BACK),
+    InlineKeyboardButton(f"{EMOJI_CHECK} Done", callback_data=CB_SPLIT_DONE),
+    InlineKeyboardButton(f"{EMOJI_CANCEL} Cancel", callback_data=CB_SPLIT_CANCEL),
+)
+
+
+def get_main_keyboard():
+    return _MAIN_KB
 
 
 def get_member_keyboard(data):
-    members = data.get("members", [])
+    members = data["members"]
     if not members:
         return None
-    buttons = [[KeyboardButton(member)] for member in members]
+    buttons = [[KeyboardButton(member)] for member in members.values()]
     buttons.append([KeyboardButton("Done")])
     return ReplyKeyboardMarkup(buttons, resize_keyboard=True)
 
 
-def build_payer_inline_kb(members):
+# Keyboards below are cached per member list; the tuple key changes whenever members do
+@lru_cache(maxsize=8)
+def _payer_inline_kb(members):
     rows = [[InlineKeyboardButton(m, callback_data=f"{CB_PAYER_PREFIX}{m}")] for m in members]
     return InlineKeyboardMarkup(rows)
 
 
-def build_split_inline_kb(members, selected):
-    rows = []
-    for m in members:
-        picked = m in selected
-        label = f"{'✅ ' if picked else ''}{m}"
-        rows.append(
-            [InlineKeyboardButton(label, callback_data=f"{CB_SPLIT_TOGGLE_PREFIX}{m}")]
+def build_payer_inline_kb(members):
+    return _payer_inline_kb(tuple(members))
+
+
+@lru_cache(maxsize=8)
+def _split_buttons(members):
+    # (unpicked, picked) button pair per member
+    return tuple(
+        (
+            InlineKeyboardButton(m, callback_data=f"{CB_SPLIT_TOGGLE_PREFIX}{m}"),
+            InlineKeyboardButton(f"{EMOJI_CHECK} {m}", callback_data=f"{CB_SPLIT_TOGGLE_PREFIX}{m}"),
         )
-    rows.append(
-        [
-            InlineKeyboardButton("⬅️ Back", callback_data=CB_SPLIT_BACK),
-            InlineKeyboardButton("✅ Done", callback_data=CB_SPLIT_DONE),
-            InlineKeyboardButton("✖️ Cancel", callback_data=CB_SPLIT_CANCEL),
-        ]
+        for m in members
     )
-    return InlineKeyboardMarkup(rows)
+
+
+def build_split_rows(members):
+    # Returns the member -> (unpicked, picked) buttons and the member -> row map,
+    # so a toggle only has to swap the one row that changed
+    buttons = dict(zip(members, _split_buttons(tuple(members))))
+    rows = {m: [pair[0]] for m, pair in buttons.items()}
+    return buttons, rows
+
+
+def build_split_inline_kb(rows):
+    return InlineKeyboardMarkup([*rows.values(), _SPLIT_CONTROL_ROW])
 
 
 async def start(update: Update, context: CallbackContext) -> None:
@@ -122,7 +361,7 @@ async def start(update: Update, context: CallbackContext) -> None:
 async def manage_members(update: Update, context: CallbackContext) -> int:
     data = load_data()
     if data["members"]:
-        members_list = ", ".join(data["members"])
+        members_list = ", ".join(data["members"].values())
         txt = (
             f"Current members: {members_list}\n\n"
             "Send a name to add/remove.\n"
@@ -141,21 +380,18 @@ async def manage_members(update: Update, context: CallbackContext) -> int:
 async def modify_members(update: Update, context: CallbackContext) -> int:
     data = load_data()
     text = update.message.text.strip()
-    if text.lower() == "back":
+    if text.casefold() == "back":
         await update.message.reply_text(
             "Member management closed.", reply_markup=get_main_keyboard()
         )
         return ConversationHandler.END
 
-    name_ci = text.lower()
-    existing_index = next(
-        (i for i, m in enumerate(data["members"]) if m.lower() == name_ci), None
-    )
-    if existing_index is not None:
-        removed = data["members"].pop(existing_index)
+    key = member_key(text)
+    removed = data["members"].pop(key, None)
+    if removed is not None:
         response = f"Removed {removed} from the household."
     else:
-        data["members"].append(text)
+        data["members"][key] = text
         response = f"Added {text} to the household."
 
     save_data(data)
@@ -184,26 +420,24 @@ async def expense_description(update: Update, context: CallbackContext) -> int:
 
 
 async def expense_amount(update: Update, context: CallbackContext) -> int:
-    try:
-        context.user_data["amount"] = round(
-            float(update.message.text.replace(",", ".")), 2
-        )
-    except ValueError:
+    text = update.message.text.strip()
+    if not AMOUNT_RE.fullmatch(text):
         await update.message.reply_text("Invalid amount. Try again (e.g. 42.50).")
         return EXPENSE_AMOUNT
+    context.user_data["amount"] = round(float(text.replace(",", ".")), 2)
 
     data = load_data()
-    if not data.get("members"):
+    if not data["members"]:
         await update.message.reply_text(
             "No members found. Please add members first.",
             reply_markup=get_main_keyboard(),
         )
         return ConversationHandler.END
 
-    await update.message.reply_text("Who paid?", reply_markup=ReplyKeyboardRemove())
+    # start_expense already removed the reply keyboard, so one message is enough
     await update.message.reply_html(
-        "<b>Select payer:</b>",
-        reply_markup=build_payer_inline_kb(data["members"]),
+        "<b>Who paid?</b>",
+        reply_markup=build_payer_inline_kb(data["members"].values()),
     )
     return EXPENSE_PAYER
 
@@ -216,14 +450,15 @@ async def expense_payer_cb(update: Update, context: CallbackContext) -> int:
         payer = query.data[len(CB_PAYER_PREFIX) :]
         context.user_data["payer"] = payer
         context.user_data["split_with"] = set()
+        buttons, rows = build_split_rows(data["members"].values())
+        context.user_data["split_buttons"] = buttons
+        context.user_data["split_rows"] = rows
         await query.edit_message_text(
-            "Select who shares the expense (toggle). Then press ✅ Done."
+            f"Select who shares the expense (toggle). Then press {EMOJI_CHECK} Done."
         )
         await query.message.reply_text(
             "Split with:",
-            reply_markup=build_split_inline_kb(
-                data["members"], context.user_data["split_with"]
-            ),
+            reply_markup=build_split_inline_kb(rows),
         )
         return EXPENSE_SPLIT
     return EXPENSE_PAYER
@@ -237,7 +472,7 @@ async def expense_split_cb(update: Update, context: CallbackContext) -> int:
     if query.data == CB_SPLIT_BACK:
         await query.edit_message_text("Who paid?")
         await query.message.reply_text(
-            "Select payer:", reply_markup=build_payer_inline_kb(data["members"])
+            "Select payer:", reply_markup=build_payer_inline_kb(data["members"].values())
         )
         return EXPENSE_PAYER
 
@@ -249,7 +484,9 @@ async def expense_split_cb(update: Update, context: CallbackContext) -> int:
         return ConversationHandler.END
 
     if query.data == CB_SPLIT_DONE:
-        selected = list(context.user_data.get("split_with", []))
+        # Keep the household's member order so receipts and records are deterministic
+        split_with = context.user_data.get("split_with", set())
+        selected = [m for m in data["members"].values() if m in split_with]
         if not selected:
             await query.answer("Select at least one person.", show_alert=True)
             return EXPENSE_SPLIT
@@ -257,10 +494,9 @@ async def expense_split_cb(update: Update, context: CallbackContext) -> int:
         amount = context.user_data["amount"]
         payer = context.user_data["payer"]
         desc = context.user_data["description"]
-        today = datetime.now().strftime("%Y-%m-%d")
+        today = date.today().isoformat()
 
-        db = load_data()
-        db["expenses"].append(
+        append_expense(
             {
                 "date": today,
                 "description": desc,
@@ -269,26 +505,28 @@ async def expense_split_cb(update: Update, context: CallbackContext) -> int:
                 "split_with": selected,
             }
         )
-        save_data(db)
 
         await query.edit_message_text(
             f"Added expense: {today} — {desc} — {amount:.2f}€\n"
             f"Payer: {payer}\nSplit with: {', '.join(selected)}"
         )
-        await query.message.reply_text("Done ✅", reply_markup=get_main_keyboard())
+        await query.message.reply_text(f"Done {EMOJI_CHECK}", reply_markup=get_main_keyboard())
         return ConversationHandler.END
 
     if query.data.startswith(CB_SPLIT_TOGGLE_PREFIX):
         member = query.data[len(CB_SPLIT_TOGGLE_PREFIX) :]
+        buttons = context.user_data["split_buttons"]
+        if member not in buttons:
+            return EXPENSE_SPLIT
         sel = context.user_data.get("split_with", set())
         if member in sel:
             sel.remove(member)
         else:
             sel.add(member)
         context.user_data["split_with"] = sel
-        await query.edit_message_reply_markup(
-            reply_markup=build_split_inline_kb(data["members"], sel)
-        )
+        rows = context.user_data["split_rows"]
+        rows[member] = [buttons[member][member in sel]]
+        await query.edit_message_reply_markup(reply_markup=build_split_inline_kb(rows))
         return EXPENSE_SPLIT
 
     return EXPENSE_SPLIT
@@ -320,42 +558,43 @@ async def chore_user(update: Update, context: CallbackContext) -> int:
 
 
 async def chore_minutes(update: Update, context: CallbackContext) -> int:
-    data = load_data()
-    try:
-        minutes = int(update.message.text)
-        points = minutes // 15
-        user = context.user_data["user"]
-        data["chores"][user] = data["chores"].get(user, 0) + points
-        save_data(data)
-        await update.message.reply_text(
-            f"{user} earned {points} points!", reply_markup=get_main_keyboard()
-        )
-        return ConversationHandler.END
-    except ValueError:
+    text = update.message.text.strip()
+    if not text.isdecimal():
         await update.message.reply_text(
             "Invalid input. Enter the minutes again."
         )
         return CHORE_MINUTES
 
+    data = load_data()
+    minutes = int(text)
+    points = minutes // 15
+    user = context.user_data["user"]
+    key = member_key(user)
+    data["chores"][key] = data["chores"].get(key, 0) + points
+    mark_dirty()
+    await update.message.reply_text(
+        f"{user} earned {points} points!", reply_markup=get_main_keyboard()
+    )
+    return ConversationHandler.END
+
 
 # Show latest logged expenses
 async def list_expenses(update: Update, context: CallbackContext) -> None:
-    data = load_data()
-    if not data.get("expenses"):
+    expenses = load_recent_expenses()
+    if not expenses:
         await update.message.reply_text(
             "No expenses recorded yet.", reply_markup=get_main_keyboard()
         )
         return
-    items = data["expenses"][-EXPENSE_LIST_LIMIT:][::-1]
     lines = []
-    for e in items:
-        date = e.get("date", "?")
+    for e in reversed(expenses):
+        day = e.get("date", "?")
         desc = e.get("description", "(no description)")
         amt = e.get("amount", 0.0)
         payer = e.get("payer", "?")
         split = ", ".join(e.get("split_with", [])) or "-"
         lines.append(
-            f"{date} — {desc} — {amt:.2f}€ | Payer: {payer} | Split: {split}"
+            f"{day} — {desc} — {amt:.2f}€ | Payer: {payer} | Split: {split}"
         )
     text = "Recent Expenses:\n" + "\n".join(lines)
     await update.message.reply_text(text, reply_markup=get_main_keyboard())
@@ -364,16 +603,16 @@ async def list_expenses(update: Update, context: CallbackContext) -> None:
 # Calculate + show standings
 async def standings(update: Update, context: CallbackContext) -> None:
     data = load_data()
-    members = data.get("members", [])
+    members = data["members"]
     if not members:
         await update.message.reply_text(
             "No members recorded yet.", reply_markup=get_main_keyboard()
         )
         return
 
-    balances = {m: 0.0 for m in members}
+    balances = {key: 0.0 for key in members}
 
-    for expense in data.get("expenses", []):
+    for expense in load_expenses():
         payer = expense.get("payer", "")
         amount = float(expense.get("amount", 0.0))
         split_with = expense.get("split_with", []) or []
@@ -381,28 +620,27 @@ async def standings(update: Update, context: CallbackContext) -> None:
             continue
         share = amount / len(split_with)
 
-        payer_key = next((m for m in members if m.lower() == payer.lower()), None)
-        if payer_key:
-            balances[payer_key] = balances.get(payer_key, 0.0) + amount
+        payer_key = member_key(payer)
+        if payer_key in balances:
+            balances[payer_key] += amount
 
         for u in split_with:
-            u_key = next((m for m in members if m.lower() == u.lower()), None)
-            if u_key:
-                balances[u_key] = balances.get(u_key, 0.0) - share
+            u_key = member_key(u)
+            if u_key in balances:
+                balances[u_key] -= share
 
-    chores = {}
-    for name, pts in (data.get("chores", {}) or {}).items():
-        mkey = next((m for m in members if m.lower() == name.lower()), None)
-        if mkey:
-            chores[mkey] = pts
+    chores = data["chores"]
+    # Every member gets an entry so the dict's own lookup can serve as the sort key
+    points_by_key = {key: chores.get(key, 0) for key in members}
 
-    ordered = sorted(members, key=lambda m: (chores.get(m, 0)), reverse=True)
+    ordered = list(members)
+    ordered.sort(key=points_by_key.__getitem__, reverse=True)
 
     lines = []
-    for m in ordered:
-        points = chores.get(m, 0)
-        bal = balances.get(m, 0.0)
-        lines.append(f"{m}: {points} points, {bal:+.2f}€")
+    for key in ordered:
+        points = points_by_key[key]
+        bal = balances[key]
+        lines.append(f"{members[key]}: {points} points, {bal:+.2f}€")
 
     await update.message.reply_text("\n".join(lines), reply_markup=get_main_keyboard())
 
@@ -410,21 +648,23 @@ async def standings(update: Update, context: CallbackContext) -> None:
 # Beer owed
 async def beer_owed(update: Update, context: CallbackContext) -> None:
     data = load_data()
-    leaderboard = sorted(data["chores"].items(), key=lambda x: -x[1])
+    leaderboard = list(data["chores"].items())
+    leaderboard.sort(key=itemgetter(1), reverse=True)
     if not leaderboard:
         await update.message.reply_text("No chores recorded yet.")
         return
 
     leader_points = leaderboard[0][1]
+    members = data["members"]
+    penalties = data["penalties"]
     violators = []
 
-    for user, points in leaderboard[1:]:
+    for key, points in leaderboard[1:]:
         if leader_points - points > 4:
-            weeks_lagging = data["penalties"].get(user, 0) + 1
-            data["penalties"][user] = weeks_lagging
-            violators.append(f"{user} owes {weeks_lagging} beers!")
+            weeks_lagging = penalties[key] = penalties.get(key, 0) + 1
+            violators.append(f"{members.get(key, key)} owes {weeks_lagging} beers!")
 
-    save_data(data)
+    mark_dirty()
     if violators:
         await update.message.reply_text(
             "Beer Penalties:\n" + "\n".join(violators)
@@ -473,49 +713,40 @@ async def check_weekly_penalties(context: CallbackContext) -> None:
             logger.error(f"Failed to send weekly report: {e}")
         return
 
-    chores_normalized = {}
-    for chore_user, points in data["chores"].items():
-        for member in data["members"]:
-            if member.lower() == chore_user.lower():
-                chores_normalized[member] = points
-                break
-
-    leaderboard = sorted(
-        [(member, chores_normalized.get(member, 0)) for member in data["members"]],
-        key=lambda x: -x[1],
-    )
+    members = data["members"]
+    chores = data["chores"]
+    leaderboard = [(key, chores.get(key, 0)) for key in members]
+    leaderboard.sort(key=itemgetter(1), reverse=True)
 
     if not leaderboard:
         return
 
-    leader, leader_points = leaderboard[0]
+    leader_key, leader_points = leaderboard[0]
+    leader = members[leader_key]
+    penalties = data["penalties"]
+    last_week_violators = data["last_week_violators"]
     violators = []
 
-    for member, points in leaderboard[1:]:
+    for key, points in leaderboard[1:]:
+        member = members[key]
         if leader_points - points > 4:
-            last_week_violator = data.get("last_week_violators", {}).get(
-                member.lower(), False
-            )
-            if last_week_violator:
-                weeks_lagging = data["penalties"].get(member, 0) + 1
-                data["penalties"][member] = weeks_lagging
-                violators.append(f"{member} owes {weeks_lagging} beers! 🍺")
+            if key in last_week_violators:
+                weeks_lagging = penalties[key] = penalties.get(key, 0) + 1
+                violators.append(f"{member} owes {weeks_lagging} beers! {EMOJI_BEER}")
             else:
-                if "last_week_violators" not in data:
-                    data["last_week_violators"] = {}
-                data["last_week_violators"][member.lower()] = True
+                last_week_violators[key] = True
                 violators.append(
                     f"{member} is lagging by {leader_points - points} points behind {leader}. If not improved by next week, beer penalty will apply! ⚠️"
                 )
-        elif member.lower() in data.get("last_week_violators", {}):
-            data["last_week_violators"].pop(member.lower(), None)
+        elif key in last_week_violators:
+            del last_week_violators[key]
             violators.append(
                 f"{member} has improved their standing! No beer penalty this week. 👍"
             )
 
     save_data(data)
 
-    current_date = datetime.now().strftime("%Y-%m-%d")
+    current_date = date.today().isoformat()
     if violators:
         report = f"Weekly Chore Report ({current_date}):\n\n"
         report += f"Leader: {leader} with {leader_points} points\n\n"
@@ -532,16 +763,15 @@ async def check_weekly_penalties(context: CallbackContext) -> None:
 
 
 def setup_weekly_job(application):
-    target_time = datetime.now(pytz.timezone("Europe/Berlin"))
-    target_time = target_time.replace(hour=9, minute=0, second=0, microsecond=0)
+    current_time = datetime.now(REPORT_TZ)
+    target_time = current_time.replace(hour=9, minute=0, second=0, microsecond=0)
 
-    if target_time.weekday() != 0 or datetime.now(pytz.timezone("Europe/Berlin")) > target_time:
+    if target_time.weekday() != 0 or current_time > target_time:
         days_until_monday = (7 - target_time.weekday()) % 7
         if days_until_monday == 0:
             days_until_monday = 7
         target_time = target_time + timedelta(days=days_until_monday)
 
-    current_time = datetime.now(pytz.timezone("Europe/Berlin"))
     seconds_until_target = (target_time - current_time).total_seconds()
 
     application.job_queue.run_repeating(
@@ -583,20 +813,27 @@ async def on_timeout(update: Update, context: CallbackContext) -> int:
 
 def main():
     data = load_data()
-    app = Application.builder().token(TOKEN).build()
+    app = (
+        Application.builder()
+        .token(TOKEN)
+        .post_init(start_flush_loop)
+        .post_shutdown(flush_pending)
+        .build()
+    )
 
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("expenses", list_expenses))
     app.add_handler(CommandHandler("cancel", cancel))
 
-    app.add_handler(MessageHandler(filters.Regex("^Standings$"), standings))
-    app.add_handler(MessageHandler(filters.Regex("^List Expenses$"), list_expenses))
-    app.add_handler(MessageHandler(filters.Regex("^Check Beer Owed$"), beer_owed))
-    app.add_handler(MessageHandler(filters.Regex("^Set Weekly Report$"), set_weekly_report))
-    app.add_handler(MessageHandler(filters.Regex("^Cancel$"), cancel))
+    app.add_handler(MessageHandler(filters.Regex(RX_STANDINGS), standings))
+    app.add_handler(MessageHandler(filters.Regex(RX_LIST_EXPENSES), list_expenses))
+    app.add_handler(MessageHandler(filters.Regex(RX_BEER_OWED), beer_owed))
+    app.add_handler(MessageHandler(filters.Regex(RX_WEEKLY_REPORT), set_weekly_report))
+    cancel_filter = filters.Regex(RX_CANCEL)
+    app.add_handler(MessageHandler(cancel_filter, cancel))
 
     expense_conv = ConversationHandler(
-        entry_points=[MessageHandler(filters.Regex("^Add Expense$"), start_expense)],
+        entry_points=[MessageHandler(filters.Regex(RX_ADD_EXPENSE), start_expense)],
         states={
             EXPENSE_DESCRIPTION: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, expense_description)
@@ -605,13 +842,10 @@ def main():
                 MessageHandler(filters.TEXT & ~filters.COMMAND, expense_amount)
             ],
             EXPENSE_PAYER: [
-                CallbackQueryHandler(expense_payer_cb, pattern=f"^{CB_PAYER_PREFIX}")
+                CallbackQueryHandler(expense_payer_cb, pattern=is_payer_callback)
             ],
             EXPENSE_SPLIT: [
-                CallbackQueryHandler(
-                    expense_split_cb,
-                    pattern=r"^(?:split_toggle:.*|split_done|split_back|split_cancel)$",
-                )
+                CallbackQueryHandler(expense_split_cb, pattern=is_split_callback)
             ],
             ConversationHandler.TIMEOUT: [
                 MessageHandler(filters.ALL, on_timeout)
@@ -619,14 +853,14 @@ def main():
         },
         fallbacks=[
             CommandHandler("cancel", cancel),
-            MessageHandler(filters.Regex("^Cancel$"), cancel),
+            MessageHandler(cancel_filter, cancel),
         ],
         conversation_timeout=300,
     )
     app.add_handler(expense_conv)
 
     manage_conv = ConversationHandler(
-        entry_points=[MessageHandler(filters.Regex("^Manage Members$"), manage_members)],
+        entry_points=[MessageHandler(filters.Regex(RX_MANAGE_MEMBERS), manage_members)],
         states={
             MANAGE_MEMBER: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, modify_members)
@@ -637,14 +871,14 @@ def main():
         },
         fallbacks=[
             CommandHandler("cancel", cancel),
-            MessageHandler(filters.Regex("^Cancel$"), cancel),
+            MessageHandler(cancel_filter, cancel),
         ],
         conversation_timeout=300,
     )
     app.add_handler(manage_conv)
 
     chore_conv = ConversationHandler(
-        entry_points=[MessageHandler(filters.Regex("^Add Chore$"), start_chore)],
+        entry_points=[MessageHandler(filters.Regex(RX_ADD_CHORE), start_chore)],
         states={
             CHORE_USER: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, chore_user)
@@ -658,7 +892,7 @@ def main():
         },
         fallbacks=[
             CommandHandler("cancel", cancel),
-            MessageHandler(filters.Regex("^Cancel$"), cancel),
+            MessageHandler(cancel_filter, cancel),
         ],
         conversation_timeout=300,
     )
@@ -10,22 +10,32 @@ selection, word assignment and round based scoring.
 
 from __future__ import annotations
 
+import asyncio
 import logging
+import os
 import random
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from enum import IntEnum
+from functools import lru_cache
+from operator import attrgetter
+from types import MappingProxyType
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
 
 from config import bot_token
 
 from telegram import ForceReply, InlineKeyboardButton, InlineKeyboardMarkup, Message, Update
 
 from telegram.ext import (
+    AIORateLimiter,
     ApplicationBuilder,
     CallbackQueryHandler,
     CommandHandler,
     ContextTypes,
     ConversationHandler,
     MessageHandler,
+    PersistenceInput,
+    PicklePersistence,
     filters,
 )
 from telegram.error import Forbidden, TelegramError
@@ -37,6 +47,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Sessions and conversation states are written here so games survive a restart.
+PERSISTENCE_FILE = "suskia_state.pickle"
+
+# Set SUSKIA_WEBHOOK_URL to receive updates through a webhook instead of polling.
+WEBHOOK_URL = os.environ.get("SUSKIA_WEBHOOK_URL")
+WEBHOOK_PORT = int(os.environ.get("SUSKIA_WEBHOOK_PORT", "8443"))
+WEBHOOK_SECRET = os.environ.get("SUSKIA_WEBHOOK_SECRET")
+
 # Conversation states
 (
     SELECTING_PLAYERS,
@@ -48,22 +66,44 @@ logger = logging.getLogger(__name__)
 ) = range(6)
 
 # Default role distributions for the supported number of players.
-ROLE_PRESETS: Dict[int, List[tuple[int, int, int]]] = {
-    3: [(2, 1, 0), (2, 0, 1)],
-    4: [(3, 1, 0), (2, 1, 1)],
-    5: [(3, 1, 1), (2, 2, 1)],
-    6: [(3, 2, 1), (2, 2, 2)],
-    7: [(4, 2, 1), (3, 2, 2)],
-    8: [(5, 2, 1), (4, 2, 2)],
-    9: [(5, 3, 1), (4, 3, 2)],
-    10: [(5, 3, 2), (4, 4, 2)],
+ROLE_PRESETS: Dict[int, tuple[tuple[int, int, int], ...]] = {
+    3: ((2, 1, 0), (2, 0, 1)),
+    4: ((3, 1, 0), (2, 1, 1)),
+    5: ((3, 1, 1), (2, 2, 1)),
+    6: ((3, 2, 1), (2, 2, 2)),
+    7: ((4, 2, 1), (3, 2, 2)),
+    8: ((5, 2, 1), (4, 2, 2)),
+    9: ((5, 3, 1), (4, 3, 2)),
+    10: ((5, 3, 2), (4, 4, 2)),
+}
+
+# Seat numbers, which double as the card values, for each supported player count.
+SEATS: Dict[int, tuple[int, ...]] = {n: tuple(range(1, n + 1)) for n in ROLE_PRESETS}
+
+# Callback data for every keyboard button, parsed once at import.
+PLAYER_COUNT_CALLBACKS: Dict[str, int] = {f"players:{n}": n for n in ROLE_PRESETS}
+ROLES_CALLBACKS: Dict[str, tuple[int, int, int, int]] = {
+    f"roles:{c}:{u}:{w}": (n, c, u, w)
+    for n, presets in ROLE_PRESETS.items()
+    for c, u, w in presets
 }
+CARD_CALLBACKS: Dict[str, int] = {f"card:{n}": n for n in range(1, 11)}
+ELIMINATE_CALLBACKS: Dict[str, int] = {f"eliminate:{n}": n for n in range(1, 11)}
+
 
-ROLE_NAMES = {"C": "Civilian", "U": "Undercover", "W": "Mr. White"}
-ROLE_POINTS = {"C": 1, "U": 2, "W": 4}
+class Role(IntEnum):
+    """Player roles; the values index into ROLE_NAMES and ROLE_POINTS."""
 
-WORDS_LIBRARY = {
-    "C": [
+    CIVILIAN = 0
+    UNDERCOVER = 1
+    MR_WHITE = 2
+
+
+ROLE_NAMES = ("Civilian", "Undercover", "Mr. White")
+ROLE_POINTS = (1, 2, 4)
+
+WORDS_LIBRARY = MappingProxyType({
+    "C": (
         "DOG",
         "ICE CREAM",
         "MEATBALLS",
@@ -133,8 +173,8 @@ WORDS_LIBRARY = {
         "PUMPKIN",
         "COMPUTER",
         "STOVE",
-    ],
-    "U": [
+    ),
+    "U": (
         "WOLF",
         "YOGHURT",
         "CHICKEN NUGGETS",
@@ -204,19 +244,31 @@ WORDS_LIBRARY = {
         "SQUASH",
         "LAPTOP",
         "OVEN",
-    ],
-}
+    ),
+})
 
-WORD_PAIRS = list(zip(WORDS_LIBRARY["C"], WORDS_LIBRARY["U"]))
+WORD_PAIRS = tuple(zip(WORDS_LIBRARY["C"], WORDS_LIBRARY["U"]))
 
+# Private messages revealing a player's role, filled in with str.format.
+MR_WHITE_DM = (
+    "Hi {name}!\n"
+    "You are Mr. White this round.\n"
+    "You received no secret word—listen carefully and improvise!"
+)
+SECRET_WORD_DM = (
+    "Hi {name}!\n"
+    "Your secret word is: {word}\n"
+    "Keep it to yourself and describe it carefully during the discussion."
+)
 
-@dataclass
+
+@dataclass(slots=True, eq=False, repr=False)
 class Player:
     """Stores the state for a single player in the session."""
 
     seat: int
     name: str = ""
-    role: str = ""
+    role: Optional[Role] = None
     word: str = ""
     eliminated: bool = False
     card: Optional[int] = None
@@ -224,117 +276,127 @@ class Player:
     telegram_id: Optional[int] = None
 
 
-@dataclass
+@dataclass(slots=True, eq=False, repr=False)
 class GameSession:
     """In-memory representation of the current match for a chat."""
 
     num_players: int
-    players: Dict[int, Player] = field(init=False)
-    pending_seats: List[int] = field(init=False)
-    available_cards: List[int] = field(init=False)
-    elimination_log: List[int] = field(default_factory=list)
+    # players[i] is the player in seat i + 1
+    players: List[Player] = field(init=False)
+    pending_seats: Deque[int] = field(init=False)
+    # Sorted only when a partial card keyboard has to be rendered
+    available_cards: Set[int] = field(init=False)
+    elimination_log: List[int] = field(init=False)
     role_distribution: Optional[tuple[int, int, int]] = None
     word_pair: Optional[tuple[str, str]] = None
     name_order: List[int] = field(init=False)
     next_name_index: int = 0
     name_prompt_message_id: Optional[int] = None
+    # Running counts kept up to date by assign_roles and eliminate
+    _civilians_alive: int = field(default=0, init=False)
+    _infiltrators_alive: int = field(default=0, init=False)
+    # Players grouped by team when roles are dealt, used for scoring
+    _civilians: List[Player] = field(init=False)
+    _infiltrators: List[Player] = field(init=False)
 
     def __post_init__(self) -> None:
-        self.players = {
-            seat: Player(seat=seat, name=f"Player {seat}")
-            for seat in range(1, self.num_players + 1)
-        }
-        self.pending_seats = list(self.players.keys())
-        self.available_cards = list(self.players.keys())
-        self.name_order = list(self.players.keys())
+        seats = SEATS[self.num_players]
+        self.players = [Player(seat=seat, name=f"Player {seat}") for seat in seats]
+        self.pending_seats = deque(seats)
+        self.available_cards = set(seats)
+        self.elimination_log = []
+        self.name_order = list(seats)
+        self._civilians = []
+        self._infiltrators = []
+
+    def player_at(self, seat: int) -> Optional[Player]:
+        if 1 <= seat <= self.num_players:
+            return self.players[seat - 1]
+        return None
 
     # --- helpers for role assignment -------------------------------------------------
     def assign_roles(self, civilians: int, undercovers: int, mr_white: int) -> None:
         self.role_distribution = (civilians, undercovers, mr_white)
         self.elimination_log.clear()
-        self.pending_seats = list(self.players.keys())
-        self.available_cards = list(self.players.keys())
+        seats = SEATS[self.num_players]
+        self.pending_seats = deque(seats)
+        self.available_cards = set(seats)
 
-        for player in self.players.values():
-            player.role = ""
-            player.word = ""
+        self.word_pair = random.choice(WORD_PAIRS)
+        civilian_word, undercover_word = self.word_pair
+        words = (civilian_word, undercover_word, "")
+
+        # Shuffle the roles rather than the seats so a single pass both
+        # resets every player and hands out their role and word.
+        role_plan = random.sample(
+            tuple(Role),
+            counts=(civilians, undercovers, mr_white),
+            k=self.num_players,
+        )
+        self._civilians = []
+        self._infiltrators = []
+        for player, role in zip(self.players, role_plan):
+            player.role = role
+            player.word = words[role]
             player.eliminated = False
             player.card = None
+            if role is Role.CIVILIAN:
+                self._civilians.append(player)
+            else:
+                self._infiltrators.append(player)
 
-        seats = list(self.players.keys())
-        random.shuffle(seats)
-        index = 0
-
-        if WORD_PAIRS:
-            self.word_pair = random.choice(WORD_PAIRS)
-        else:
-            self.word_pair = ("", "")
-        civilian_word, undercover_word = self.word_pair
-
-        for _ in range(civilians):
-            seat = seats[index]
-            index += 1
-            player = self.players[seat]
-            player.role = "C"
-            player.word = civilian_word
-
-        for _ in range(undercovers):
-            seat = seats[index]
-            index += 1
-            player = self.players[seat]
-            player.role = "U"
-            player.word = undercover_word
-
-        for _ in range(mr_white):
-            seat = seats[index]
-            index += 1
-            player = self.players[seat]
-            player.role = "W"
-            player.word = ""
+        self._civilians_alive = civilians
+        self._infiltrators_alive = undercovers + mr_white
 
     # --- helpers for card selection --------------------------------------------------
     def register_card_choice(self, card_value: int, user_id: int) -> Player:
-        seat = self.pending_seats.pop(0)
-        player = self.players[seat]
+        seat = self.pending_seats.popleft()
+        player = self.players[seat - 1]
         player.card = card_value
-        self.available_cards.remove(card_value)
+        self.available_cards.discard(card_value)
         player.telegram_id = user_id
         return player
 
     def revert_card_choice(self, player: Player, previous_user: Optional[int]) -> None:
         """Restore the last pending seat and card if a reveal could not be delivered."""
 
-        self.pending_seats.insert(0, player.seat)
+        self.pending_seats.appendleft(player.seat)
         if player.card is not None:
-            self.available_cards.append(player.card)
-            self.available_cards.sort()
+            self.available_cards.add(player.card)
         player.card = None
         player.telegram_id = previous_user
 
-    # --- helpers for elimination -----------------------------------------------------
-    def active_players(self) -> List[Player]:
-        return [player for player in self.players.values() if not player.eliminated]
+    def speaking_order(self) -> List[Player]:
+        """Players ordered by the card they drew; cards are a permutation of 1..N."""
 
+        order: List[Optional[Player]] = [None] * self.num_players
+        for player in self.players:
+            order[player.card - 1] = player
+        return order
+
+    # --- helpers for elimination -----------------------------------------------------
     def civilians_remaining(self) -> int:
-        return sum(1 for player in self.active_players() if player.role == "C")
+        return self._civilians_alive
 
     def infiltrators_remaining(self) -> int:
-        return sum(1 for player in self.active_players() if player.role in {"U", "W"})
+        return self._infiltrators_alive
 
-    def eliminate(self, seat: int) -> Player:
-        player = self.players[seat]
+    def eliminate(self, seat: int) -> Tuple[Player, Optional[str]]:
+        """Eliminate ``seat`` and return the player with the round outcome, if decided."""
+
+        player = self.players[seat - 1]
         player.eliminated = True
         self.elimination_log.append(seat)
-        return player
+        if player.role is Role.CIVILIAN:
+            self._civilians_alive -= 1
+        else:
+            self._infiltrators_alive -= 1
 
-    def outcome(self) -> Optional[str]:
-        infiltrators = self.infiltrators_remaining()
-        civilians = self.civilians_remaining()
-        if infiltrators == 0:
-            return "civilians"
-        if civilians == 0 or civilians <= infiltrators:
-            return "infiltrators"
-        return None
+        if self._infiltrators_alive == 0:
+            return player, "civilians"
+        if self._civilians_alive <= self._infiltrators_alive:
+            return player, "infiltrators"
+        return player, None
 
     # --- helpers for naming ----------------------------------------------------------
     def current_name_seat(self) -> Optional[int]:
@@ -346,7 +408,7 @@ class GameSession:
         seat = self.current_name_seat()
         if seat is None:
             return None
-        player = self.players[seat]
+        player = self.players[seat - 1]
         player.name = name
         self.next_name_index += 1
         return player
@@ -355,31 +417,27 @@ class GameSession:
         seat = self.current_name_seat()
         if seat is None:
             return None
-        player = self.players[seat]
+        player = self.players[seat - 1]
         self.next_name_index += 1
         return player
 
     # --- helpers for scoring ---------------------------------------------------------
     def apply_scores(self, outcome: str) -> None:
         if outcome == "civilians":
-            for player in self.players.values():
-                if player.role == "C":
-                    player.score += ROLE_POINTS["C"]
+            points = ROLE_POINTS[Role.CIVILIAN]
+            for player in self._civilians:
+                player.score += points
         else:
-            for player in self.players.values():
-                if player.role == "U" and not player.eliminated:
-                    player.score += ROLE_POINTS["U"]
-                elif player.role == "W" and not player.eliminated:
-                    player.score += ROLE_POINTS["W"]
+            for player in self._infiltrators:
+                if not player.eliminated:
+                    player.score += ROLE_POINTS[player.role]
 
     def standings(self) -> List[Player]:
-        return sorted(
-            self.players.values(),
-            key=lambda p: (-p.score, p.seat),
-        )
+        # players is in seat order and the sort is stable, so ties stay by seat
+        return sorted(self.players, key=attrgetter("score"), reverse=True)
 
-    def scoreboard_lines(self) -> List[str]:
-        return [f"{player.name}: {player.score} point(s)" for player in self.standings()]
+    def scoreboard(self) -> str:
+        return "\n".join(f"{player.name}: {player.score} point(s)" for player in self.standings())
 
     def reset_for_next_round(self) -> None:
         if not self.role_distribution:
@@ -388,6 +446,47 @@ class GameSession:
         self.assign_roles(civilians, undercovers, mr_white)
 
 
+# Strong references to in-flight background sends so they are not garbage collected.
+_BACKGROUND_TASKS: Set[asyncio.Task] = set()
+
+
+def _on_background_done(task: asyncio.Task) -> None:
+    _BACKGROUND_TASKS.discard(task)
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        logger.error("Background Telegram call failed", exc_info=exc)
+
+
+async def _run_in_order(calls: tuple[Awaitable, ...]) -> None:
+    for call in calls:
+        await call
+
+
+def _fire(*calls: Awaitable) -> None:
+    """Send Telegram calls in the background without blocking the handler.
+
+    Calls passed together are awaited one after another so the messages keep
+    their order in the chat; the handler can return its next state right away.
+    Separate ``_fire`` calls run concurrently, so an edit of the clicked
+    message should be fired on its own rather than queued ahead of a reply.
+    """
+
+    task = asyncio.create_task(_run_in_order(calls))
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_on_background_done)
+
+
+def _callback_prefix(prefix: str) -> Callable[[object], bool]:
+    """Match callback data on a literal prefix without running a regex."""
+
+    def matches(data: object) -> bool:
+        return isinstance(data, str) and data.startswith(prefix)
+
+    return matches
+
+
 def build_number_keyboard() -> InlineKeyboardMarkup:
     buttons: List[List[InlineKeyboardButton]] = []
     row: List[InlineKeyboardButton] = []
@@ -402,7 +501,7 @@ def build_number_keyboard() -> InlineKeyboardMarkup:
 
 
 def build_roles_keyboard(num_players: int) -> InlineKeyboardMarkup:
-    presets = ROLE_PRESETS.get(num_players, [])
+    presets = ROLE_PRESETS.get(num_players, ())
     buttons = []
     for civilians, undercovers, mr_white in presets:
         label = f"{civilians} Civ, {undercovers} U, {mr_white} W"
@@ -411,10 +510,11 @@ def build_roles_keyboard(num_players: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
-def build_card_keyboard(session: GameSession) -> InlineKeyboardMarkup:
+@lru_cache(maxsize=256)
+def _build_card_keyboard_for(cards: Tuple[int, ...]) -> InlineKeyboardMarkup:
     buttons: List[List[InlineKeyboardButton]] = []
     row: List[InlineKeyboardButton] = []
-    for card in session.available_cards:
+    for card in cards:
         row.append(InlineKeyboardButton(str(card), callback_data=f"card:{card}"))
         if len(row) == 5:
             buttons.append(row)
@@ -424,10 +524,38 @@ def build_card_keyboard(session: GameSession) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
+# These keyboards only depend on the player count, so they are built once at import.
+NUMBER_KEYBOARD = build_number_keyboard()
+ROLES_KEYBOARDS: Dict[int, InlineKeyboardMarkup] = {
+    n: build_roles_keyboard(n) for n in ROLE_PRESETS
+}
+FULL_CARD_KEYBOARDS: Dict[int, InlineKeyboardMarkup] = {
+    n: _build_card_keyboard_for(seats) for n, seats in SEATS.items()
+}
+ROUND_END_KEYBOARD = InlineKeyboardMarkup(
+    [
+        [InlineKeyboardButton("Next round", callback_data="round:continue")],
+        [InlineKeyboardButton("End game", callback_data="round:end")],
+    ]
+)
+# NAME_PROMPT_REPLIES[seat - 1] is the ForceReply used when naming that seat.
+NAME_PROMPT_REPLIES = tuple(
+    ForceReply(selective=False, input_field_placeholder=f"Player {seat} name")
+    for seat in SEATS[max(SEATS)]
+)
+
+
+def build_card_keyboard(session: GameSession) -> InlineKeyboardMarkup:
+    if len(session.available_cards) == session.num_players:
+        return FULL_CARD_KEYBOARDS[session.num_players]
+    return _build_card_keyboard_for(tuple(sorted(session.available_cards)))
+
+
 def build_elimination_keyboard(session: GameSession) -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton(player.name, callback_data=f"eliminate:{player.seat}")]
-        for player in sorted(session.active_players(), key=lambda p: p.seat)
+        for player in session.players
+        if not player.eliminated
     ]
     return InlineKeyboardMarkup(buttons)
 
@@ -436,22 +564,21 @@ async def prompt_next_name(message: Message, session: GameSession) -> int:
     seat = session.current_name_seat()
     if seat is None:
         session.name_prompt_message_id = None
-        await message.reply_text(
-            "All names registered! Choose the role distribution for this round:",
-        )
-        await message.reply_text(
-            "Select one of the distributions below:",
-            reply_markup=build_roles_keyboard(session.num_players),
+        _fire(
+            message.reply_text(
+                "All names registered! Choose the role distribution for this round:",
+            ),
+            message.reply_text(
+                "Select one of the distributions below:",
+                reply_markup=ROLES_KEYBOARDS[session.num_players],
+            ),
         )
         return ROLE_SELECTION
 
-    player = session.players[seat]
+    player = session.players[seat - 1]
     prompt = await message.reply_text(
         f"Reply to this message with the name for Player {seat} (current: {player.name}). Use /skip to keep it.",
-        reply_markup=ForceReply(
-            selective=False,
-            input_field_placeholder=f"Player {seat} name",
-        ),
+        reply_markup=NAME_PROMPT_REPLIES[seat - 1],
     )
     session.name_prompt_message_id = prompt.message_id
     return NAMING_PLAYERS
@@ -466,7 +593,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     if update.message:
         await update.message.reply_text(
             "How many players are taking part?",
-            reply_markup=build_number_keyboard(),
+            reply_markup=NUMBER_KEYBOARD,
         )
     return SELECTING_PLAYERS
 
@@ -477,21 +604,18 @@ async def select_players(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return SELECTING_PLAYERS
     await query.answer()
 
-    try:
-        num_players = int(query.data.split(":", 1)[1])
-    except (ValueError, IndexError):
-        await query.edit_message_text("Could not determine the number of players. Try again with /start.")
-        return ConversationHandler.END
-
-    if num_players not in ROLE_PRESETS:
+    num_players = PLAYER_COUNT_CALLBACKS.get(query.data)
+    if num_players is None:
         await query.edit_message_text("Please choose a number between 3 and 10.")
         return SELECTING_PLAYERS
 
     session = GameSession(num_players)
     context.chat_data["session"] = session
 
-    await query.edit_message_text(
-        f"Game setup for {num_players} players. Let's set everyone's name.",
+    _fire(
+        query.edit_message_text(
+            f"Game setup for {num_players} players. Let's set everyone's name.",
+        )
     )
     return await prompt_next_name(query.message, session)
 
@@ -552,30 +676,30 @@ async def select_roles(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
         await query.edit_message_text("Game session not found. Start a new game with /start.")
         return ConversationHandler.END
 
-    try:
-        _, civilians, undercovers, mr_white = query.data.split(":")
-        civilians = int(civilians)
-        undercovers = int(undercovers)
-        mr_white = int(mr_white)
-    except (ValueError, IndexError):
+    preset = ROLES_CALLBACKS.get(query.data)
+    if preset is None:
         await query.edit_message_text("Invalid role selection. Please pick a preset from the keyboard.")
         return ROLE_SELECTION
 
-    if civilians + undercovers + mr_white != session.num_players:
+    num_players, civilians, undercovers, mr_white = preset
+    if num_players != session.num_players:
         await query.edit_message_text("The distribution does not match the number of players.")
         return ROLE_SELECTION
 
     session.assign_roles(civilians, undercovers, mr_white)
 
-    await query.edit_message_text(
-        f"Roles assigned! {civilians} Civilians, {undercovers} Undercover(s) and {mr_white} Mr. White.",
-    )
-
     next_seat = session.pending_seats[0]
-    next_player = session.players[next_seat]
-    await query.message.reply_text(
-        f"{next_player.name}, please choose a card to determine the order.",
-        reply_markup=build_card_keyboard(session),
+    next_player = session.players[next_seat - 1]
+    _fire(
+        query.edit_message_text(
+            f"Roles assigned! {civilians} Civilians, {undercovers} Undercover(s) and {mr_white} Mr. White.",
+        )
+    )
+    _fire(
+        query.message.reply_text(
+            f"{next_player.name}, please choose a card to determine the order.",
+            reply_markup=build_card_keyboard(session),
+        )
     )
     return CARD_SELECTION
 
@@ -595,9 +719,8 @@ async def select_card(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         await query.answer("All cards have already been drawn.", show_alert=True)
         return CARD_SELECTION
 
-    try:
-        card_value = int(query.data.split(":", 1)[1])
-    except (ValueError, IndexError):
+    card_value = CARD_CALLBACKS.get(query.data)
+    if card_value is None:
         await query.edit_message_text("That card could not be processed. Try again.")
         return CARD_SELECTION
 
@@ -606,7 +729,7 @@ async def select_card(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         return CARD_SELECTION
 
     seat = session.pending_seats[0]
-    player = session.players[seat]
+    player = session.players[seat - 1]
 
     user_id = query.from_user.id
     if player.telegram_id and player.telegram_id != user_id:
@@ -619,25 +742,19 @@ async def select_card(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     previous_user = player.telegram_id
     player = session.register_card_choice(card_value, user_id)
 
+    user = query.from_user
     proposed_name = player.name
     if player.name.startswith("Player "):
-        proposed_name = query.from_user.full_name or player.name
-
-    if player.role == "W":
-        dm_lines = [
-            f"Hi {query.from_user.first_name or proposed_name}!",
-            "You are Mr. White this round.",
-            "You received no secret word—listen carefully and improvise!",
-        ]
+        proposed_name = user.full_name or player.name
+
+    greeting_name = user.first_name or proposed_name
+    if player.role is Role.MR_WHITE:
+        dm_text = MR_WHITE_DM.format(name=greeting_name)
     else:
-        dm_lines = [
-            f"Hi {query.from_user.first_name or proposed_name}!",
-            f"Your secret word is: {player.word}",
-            "Keep it to yourself and describe it carefully during the discussion.",
-        ]
+        dm_text = SECRET_WORD_DM.format(name=greeting_name, word=player.word)
 
     try:
-        await context.bot.send_message(chat_id=user_id, text="\n".join(dm_lines))
+        await context.bot.send_message(chat_id=user_id, text=dm_text)
     except Forbidden:
         session.revert_card_choice(player, previous_user)
         await query.answer(
@@ -656,27 +773,32 @@ async def select_card(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
 
     player.name = proposed_name
 
-    await query.edit_message_text(
-        f"{player.name} drew card {card_value}. Check your private messages!",
+    _fire(
+        query.edit_message_text(
+            f"{player.name} drew card {card_value}. Check your private messages!",
+        )
     )
 
     if session.pending_seats:
         next_seat = session.pending_seats[0]
-        next_player = session.players[next_seat]
-        await query.message.reply_text(
-            f"{next_player.name}, choose your card:",
-            reply_markup=build_card_keyboard(session),
+        next_player = session.players[next_seat - 1]
+        _fire(
+            query.message.reply_text(
+                f"{next_player.name}, choose your card:",
+                reply_markup=build_card_keyboard(session),
+            )
         )
         return CARD_SELECTION
 
     order_text = ", ".join(
-        f"{session.players[seat].name} (card {session.players[seat].card})"
-        for seat in sorted(session.players.keys(), key=lambda s: session.players[s].card or 0)
+        f"{p.name} (card {p.card})"
+        for p in session.speaking_order()
     )
-    await query.message.reply_text(f"Speaking order based on cards: {order_text}")
-    await query.message.reply_text(
-        "Select a player to eliminate:",
-        reply_markup=build_elimination_keyboard(session),
+    _fire(
+        query.message.reply_text(
+            f"Speaking order based on cards: {order_text}\n\nSelect a player to eliminate:",
+            reply_markup=build_elimination_keyboard(session),
+        )
     )
     return ELIMINATION
 
@@ -692,52 +814,49 @@ async def handle_elimination(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await query.edit_message_text("Game session not found. Start a new game with /start.")
         return ConversationHandler.END
 
-    try:
-        seat = int(query.data.split(":", 1)[1])
-    except (ValueError, IndexError):
+    seat = ELIMINATE_CALLBACKS.get(query.data)
+    if seat is None:
         await query.edit_message_text("Invalid selection. Try again.")
         return ELIMINATION
 
-    player = session.players.get(seat)
+    player = session.player_at(seat)
     if not player or player.eliminated:
         await query.answer("That player is already out.", show_alert=True)
         return ELIMINATION
 
-    session.eliminate(seat)
-    await query.edit_message_text(
-        f"{player.name} has been eliminated and was {ROLE_NAMES.get(player.role, 'Unknown')}!",
+    player, outcome = session.eliminate(seat)
+    _fire(
+        query.edit_message_text(
+            f"{player.name} has been eliminated and was {ROLE_NAMES[player.role]}!",
+        )
     )
 
-    outcome = session.outcome()
     if outcome:
-        return await finalize_round(query, session, outcome)
+        return finalize_round(query, session, outcome)
 
-    await query.message.reply_text(
-        "Select the next player to eliminate:",
-        reply_markup=build_elimination_keyboard(session),
+    _fire(
+        query.message.reply_text(
+            "Select the next player to eliminate:",
+            reply_markup=build_elimination_keyboard(session),
+        )
     )
     return ELIMINATION
 
 
-async def finalize_round(query, session: GameSession, outcome: str) -> int:
+def finalize_round(query, session: GameSession, outcome: str) -> int:
     if outcome == "civilians":
-        await query.message.reply_text("All infiltrators have been eliminated. Civilians win this round!")
+        result = "All infiltrators have been eliminated. Civilians win this round!"
     else:
-        await query.message.reply_text("Infiltrators now outnumber civilians. Undercover team wins!")
+        result = "Infiltrators now outnumber civilians. Undercover team wins!"
 
     session.apply_scores(outcome)
-    scoreboard = session.scoreboard_lines()
-    await query.message.reply_text("Current standings:\n" + "\n".join(scoreboard))
-
-    keyboard = InlineKeyboardMarkup(
-        [
-            [InlineKeyboardButton("Next round", callback_data="round:continue")],
-            [InlineKeyboardButton("End game", callback_data="round:end")],
-        ]
-    )
-    await query.message.reply_text(
-        "Do you want to play another round with the same players?",
-        reply_markup=keyboard,
+
+    _fire(
+        query.message.reply_text(
+            f"{result}\n\nCurrent standings:\n{session.scoreboard()}\n\n"
+            "Do you want to play another round with the same players?",
+            reply_markup=ROUND_END_KEYBOARD,
+        )
     )
     return ROUND_END
 
@@ -753,73 +872,114 @@ async def handle_round_end(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         await query.edit_message_text("Game session not found. Start a new game with /start.")
         return ConversationHandler.END
 
-    _, action = query.data.split(":", 1)
-    if action == "continue":
+    if query.data == "round:continue":
         session.reset_for_next_round()
-        await query.edit_message_text("Starting the next round!")
+        _fire(query.edit_message_text("Starting the next round!"))
+        replies = []
         if session.role_distribution:
             civ, und, white = session.role_distribution
-            await query.message.reply_text(
-                f"Roles reassigned! {civ} Civilians, {und} Undercover(s), {white} Mr. White.",
+            replies.append(
+                query.message.reply_text(
+                    f"Roles reassigned! {civ} Civilians, {und} Undercover(s), {white} Mr. White.",
+                )
             )
         next_seat = session.pending_seats[0]
-        next_player = session.players[next_seat]
-        await query.message.reply_text(
-            f"{next_player.name}, please choose a card to determine the order.",
-            reply_markup=build_card_keyboard(session),
+        next_player = session.players[next_seat - 1]
+        replies.append(
+            query.message.reply_text(
+                f"{next_player.name}, please choose a card to determine the order.",
+                reply_markup=build_card_keyboard(session),
+            )
         )
+        _fire(*replies)
         return CARD_SELECTION
 
-    await query.edit_message_text("Game over! Thanks for playing.")
-    scoreboard = session.scoreboard_lines()
-    if scoreboard:
-        await query.message.reply_text("Final standings:\n" + "\n".join(scoreboard))
+    _fire(query.edit_message_text("Game over! Thanks for playing."))
+    replies = [query.message.reply_text("Final standings:\n" + session.scoreboard())]
     context.chat_data.pop("session", None)
-    await query.message.reply_text("Use /start to begin a new game at any time.")
+    replies.append(query.message.reply_text("Use /start to begin a new game at any time."))
+    _fire(*replies)
     return ConversationHandler.END
 
 
 async def cancel_game(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     session = context.chat_data.pop("session", None)
+    calls = []
     if update.callback_query:
         await update.callback_query.answer()
-        await update.callback_query.edit_message_text("Game cancelled.")
+        calls.append(update.callback_query.edit_message_text("Game cancelled."))
     elif update.message:
-        await update.message.reply_text("Game cancelled.")
+        calls.append(update.message.reply_text("Game cancelled."))
 
-    if session:
-        scoreboard = session.scoreboard_lines()
-        if scoreboard and update.effective_message:
-            await update.effective_message.reply_text(
-                "Standings before cancellation:\n" + "\n".join(scoreboard)
+    if session and update.effective_message:
+        calls.append(
+            update.effective_message.reply_text(
+                "Standings before cancellation:\n" + session.scoreboard()
             )
+        )
+    _fire(*calls)
     return ConversationHandler.END
 
 
 def main(bot_token: str) -> None:
-    application = ApplicationBuilder().token(bot_token).build()
+    persistence = PicklePersistence(
+        filepath=PERSISTENCE_FILE,
+        store_data=PersistenceInput(bot_data=False, user_data=False, callback_data=False),
+        single_file=False,
+    )
+    builder = (
+        ApplicationBuilder()
+        .token(bot_token)
+        .persistence(persistence)
+    )
+    try:
+        # Keep under Telegram's overall limit of 30 messages/s. The per-group limit
+        # (20/min) is left off: updates are processed one at a time, and handlers
+        # await their group prompts, so a throttled group would stall every chat.
+        builder.rate_limiter(
+            AIORateLimiter(
+                overall_max_rate=30,
+                overall_time_period=1,
+                group_max_rate=0,
+            )
+        )
+    except RuntimeError:
+        logger.warning(
+            "Running without rate limiting; install python-telegram-bot[rate-limiter] to enable it."
+        )
+    application = builder.build()
 
     conv_handler = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
         states={
-            SELECTING_PLAYERS: [CallbackQueryHandler(select_players, pattern=r"^players:")],
+            SELECTING_PLAYERS: [CallbackQueryHandler(select_players, pattern=_callback_prefix("players:"))],
             NAMING_PLAYERS: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, capture_player_name),
                 CommandHandler("skip", skip_player_name),
             ],
-            ROLE_SELECTION: [CallbackQueryHandler(select_roles, pattern=r"^roles:")],
-            CARD_SELECTION: [CallbackQueryHandler(select_card, pattern=r"^card:")],
-            ELIMINATION: [CallbackQueryHandler(handle_elimination, pattern=r"^eliminate:")],
-            ROUND_END: [CallbackQueryHandler(handle_round_end, pattern=r"^round:")],
+            ROLE_SELECTION: [CallbackQueryHandler(select_roles, pattern=_callback_prefix("roles:"))],
+            CARD_SELECTION: [CallbackQueryHandler(select_card, pattern=_callback_prefix("card:"))],
+            ELIMINATION: [CallbackQueryHandler(handle_elimination, pattern=_callback_prefix("eliminate:"))],
+            ROUND_END: [CallbackQueryHandler(handle_round_end, pattern=_callback_prefix("round:"))],
         },
         fallbacks=[CommandHandler("end", cancel_game), CommandHandler("cancel", cancel_game)],
         per_chat=True,
+        name="suskia_game",
+        persistent=True,
     )
 
     application.add_handler(conv_handler)
     application.add_handler(CommandHandler("end", cancel_game))
 
-    application.run_polling()
+    if WEBHOOK_URL:
+        application.run_webhook(
+            listen="0.0.0.0",
+            port=WEBHOOK_PORT,
+            webhook_url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET,
+        )
+    else:
+        application.run_polling()
 
 
 if __name__ == "__main__":